@@ -1,12 +1,19 @@
-from typing import Generator
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.db import session as db_session
 from app.db.session import SessionLocal
 from app.models.user import User
 from app.core import security
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login/access-token")
@@ -18,7 +25,47 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_async_db() -> AsyncGenerator:
+    if db_session.AsyncSessionLocal is None:
+        raise HTTPException(status_code=503, detail=f"Async database unavailable: {db_session.ASYNC_DB_ERROR}")
+    async with db_session.AsyncSessionLocal() as db:
+        yield db
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Lightweight, cacheable view of an authenticated user (no ORM session attached).
+    """
+    id: int
+    email: str
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+    is_superuser: bool
+
+# token -> (Principal, jwt exp); entries never outlive the token itself
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    return await get_user_from_token(token, db)
+
+async def get_user_from_token(token: str, db: AsyncSession) -> Principal:
+    """
+    Resolve a bearer token to a Principal. Tokens already seen are served from
+    principal_cache without decoding the JWT or touching the database, so a role
+    change made in the database shows up after PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    key = _token_key(token)
+    cached = principal_cache.get(key)
+    if cached is not None:
+        principal, expires_at = cached
+        if expires_at > time.time():
+            return principal
+        principal_cache.pop(key)
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -32,7 +79,20 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == username).first()
+    user = (await db.execute(select(User).where(User.email == username).limit(1))).scalars().first()
     if user is None:
         raise credentials_exception
-    return user
+
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        role=user.role or "user",
+        is_active=bool(user.is_active) if user.is_active is not None else True,
+        is_superuser=bool(user.is_superuser),
+    )
+    expires_at = float(payload.get("exp", time.time() + settings.PRINCIPAL_CACHE_TTL_SECONDS))
+    ttl = min(settings.PRINCIPAL_CACHE_TTL_SECONDS, expires_at - time.time())
+    if ttl > 0:
+        principal_cache.set(key, (principal, expires_at), ttl_seconds=ttl)
+    return principal
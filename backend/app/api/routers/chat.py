@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.api import deps
+from app.core.responses import FastJSONResponse
+from app.db import session as db_session
 from app.models.user import User
 from app.models.message import Message
+from app.models.dm_channel import DMChannel
+from app.services.dm_channels import ensure_dm_members, mark_dm_read
+from app.services.chat_broker import Subscription, chat_broker
+from app.services.ttl_reaper import ttl_reaper
+from app.services.archive import archive_scheduler, archived_event, message_archive
+from app.services.message_events import REPLY_PREVIEW_CHARS, for_viewer, message_event
+from app.services.search import SEARCH_DIALECTS, search_messages
+from app.services.message_writer import message_writer
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 
 router = APIRouter()
 
@@ -26,23 +38,80 @@ class MessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+_messages = Message.__table__
+_replies = _messages.alias("reply_to")
+
+# /chat/messages page: Core rows with just the rendered columns, no ORM objects or
+# identity map; the parent message contributes its id, sender and a preview cut in SQL
+MESSAGE_PAGE = select(
+    _messages.c.id, _messages.c.content_encrypted, _messages.c.sender_id, _messages.c.timestamp,
+    _messages.c.is_blocked, _messages.c.ai_score, _messages.c.opsec_risk, _messages.c.phishing_risk,
+    _messages.c.file_url, _messages.c.file_type, _messages.c.file_size, _messages.c.integrity_hash,
+    _messages.c.is_deleted, _messages.c.expiration,
+    _replies.c.id.label("reply_id"), _replies.c.sender_id.label("reply_sender_id"),
+    func.substr(_replies.c.content_encrypted, 1, REPLY_PREVIEW_CHARS).label("reply_text"),
+).select_from(_messages.outerjoin(_replies, _replies.c.id == _messages.c.reply_to_id))
+
+def page_row_for_viewer(row, viewer_id: int) -> dict:
+    """
+    for_viewer(message_event(msg)) for a MESSAGE_PAGE row, built in one pass.
+    """
+    return {
+        "id": row.id,
+        "text": row.content_encrypted,
+        "timestamp": row.timestamp,
+        "status": "blocked" if row.is_blocked else "sent",
+        "risk": {
+            "ai_score": row.ai_score if row.ai_score is not None else 0.0,
+            "opsec_risk": row.opsec_risk if row.opsec_risk else "SAFE",
+            "phishing_risk": row.phishing_risk if row.phishing_risk else "LOW",
+            "explanation": "Analysis complete"
+        },
+        "file_url": row.file_url,
+        "file_type": row.file_type,
+        "file_size": row.file_size,
+        "integrity_hash": row.integrity_hash,
+        "reply_to": {
+            "id": row.reply_id,
+            "text": row.reply_text,
+            "sender": "me" if row.reply_sender_id == viewer_id else "them"
+        } if row.reply_id is not None else None,
+        "is_deleted": row.is_deleted,
+        "sender": "me" if row.sender_id == viewer_id else "them",
+    }
+
+def can_access_channel(user_id: int, channel_id: str) -> bool:
+    # DM channels are "dm_{min_id}_{max_id}"; group channels are open to everyone
+    if not channel_id.startswith("dm_"):
+        return True
+    parts = channel_id.split("_")
+    return len(parts) == 3 and str(user_id) in parts[1:]
+
+# Upper bound for a single /messages page
+MAX_PAGE_SIZE = 200
+# Inline inserts (no message writer) can commit out of id order: an after_id poll
+# also re-reads the channel's last rows at or below the cursor from this recent
+# window, so a row committed after a higher id is not skipped. Clients dedupe on id
+POLL_OVERLAP = timedelta(seconds=10)
+POLL_OVERLAP_ROWS = 20
+
 class DMRequest(BaseModel):
     identifier: str # Email or User ID
 
 @router.post("/dm")
-def start_dm(
+async def start_dm(
     request: DMRequest,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_user)
 ):
     # Determine if identifier is ID or Email
     target_user = None
     if request.identifier.isdigit():
-        target_user = db.query(User).filter(User.id == int(request.identifier)).first()
+        target_user = await db.get(User, int(request.identifier))
     
     if not target_user:
          # Fallback to email
-        target_user = db.query(User).filter(User.email == request.identifier).first()
+        target_user = (await db.execute(select(User).where(User.email == request.identifier).limit(1))).scalars().first()
         
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -55,6 +124,8 @@ def start_dm(
     u1 = min(current_user.id, target_user.id)
     u2 = max(current_user.id, target_user.id)
     channel_id = f"dm_{u1}_{u2}"
+    await db.run_sync(ensure_dm_members, channel_id, u1, u2)
+    await db.commit()
     
     return {
         "channel_id": channel_id,
@@ -66,119 +137,168 @@ def start_dm(
     }
 
 @router.get("/dms")
-def get_dms(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+async def get_dms(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_user)
 ):
     """
-    Fetch all active DM channels for the current user.
-    Finds unique channel_ids starting with "dm_" where user is involved.
+    Fetch all DM channels for the current user, most recently active first.
+    Served from the dm_channels membership table in one indexed join.
     """
-    # Find all messages where user is sender or (channel starts with dm_ and involves user ID logic)
-    # But messages don't store "participants" explicitly except in channel_id or sender_id.
-    # We can query distinct channel_ids from messages table.
-    
-    # 1. Get distinct channels from messages table for this user
-    # A DM channel ID is "dm_{min}_{max}".
-    # We can find all channels where user send a message OR (future: received one).
-    # Since we don't store receivers yet for old messages, and only sender_id is reliable...
-    # We can check channel_ids which contain user ID? dm_3_5. If my ID is 3. "dm_3_5" matches.
-    # Reliable way: Check distinct channel_ids where channel_id LIKE 'dm_%'
-    # AND (sender_id == current_user.id OR receiver_id == current_user.id)
-    
-    # Actually, simpler:
-    sent_channels = db.query(Message.channel_id).filter(Message.sender_id == current_user.id).filter(Message.channel_id.like("dm_%")).distinct().all()
-    received_channels = db.query(Message.channel_id).filter(Message.receiver_id == current_user.id).filter(Message.channel_id.like("dm_%")).distinct().all()
-    
-    all_channel_ids = set([c[0] for c in sent_channels])
-    all_channel_ids.update([c[0] for c in received_channels])
-    
-    # Now interpret IDs to find the "Other User"
-    dms = []
-    for cid in all_channel_ids:
-        try:
-            parts = cid.split("_") # dm, id1, id2
-            if len(parts) != 3: continue
-            
-            uid1, uid2 = int(parts[1]), int(parts[2])
-            other_id = uid2 if uid1 == current_user.id else uid1
-            
-            # If I am neither? (Shouldn't happen if filtered by sender_id)
-            if uid1 != current_user.id and uid2 != current_user.id: continue
-            
-            other_user = db.query(User).filter(User.id == other_id).first()
-            if other_user:
-                dms.append({
-                    "id": cid,
-                    "name": other_user.full_name or other_user.email,
-                    "status": "ENCRYPTED"
-                })
-        except:
-            continue
+    rows = (await db.execute(
+        select(DMChannel.channel_id, DMChannel.last_message_at, DMChannel.unread_count, User.full_name, User.email)
+        .join(User, User.id == DMChannel.peer_id)
+        .where(DMChannel.user_id == current_user.id)
+        # Channels without messages yet go last on every backend
+        .order_by(DMChannel.last_message_at.is_(None), DMChannel.last_message_at.desc())
+    )).all()
+    dms = [
+        {
+            "id": row.channel_id,
+            "name": row.full_name or row.email,
+            "status": "ENCRYPTED",
+            "last_activity": row.last_message_at,
+            "unread": row.unread_count
+        }
+        for row in rows
+    ]
             
     return dms
 
 @router.get("/messages")
-def get_messages(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+async def get_messages(
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_user),
     limit: int = 50,
-    channel_id: str = "general"
+    channel_id: str = "general",
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
 ):
     """
-    Fetch messages for a specific channel.
+    Fetch messages for a specific channel, oldest first.
+
+    Keyset pagination on the message id (ids are assigned in send order):
+    - no cursor: the newest `limit` messages
+    - before_id: the `limit` messages immediately older than that id (scroll back)
+    - after_id: only messages newer than that id (incremental poll). Without the
+      message writer (which commits in id order) the poll may repeat recent
+      messages at or below after_id; dedupe on id
+    Pages continue into the cold-storage archive once the cursor passes the
+    oldest message still in the table.
     """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    archived_last_id = message_archive.last_id(channel_id)
     try:
-        # Optimize query heavily with joinedload to prevent N+1 lookups on replies
-        query = db.query(Message).options(joinedload(Message.reply_to)).filter(Message.channel_id == channel_id)
-        # Filter expiration manually or skip for debug
-        query = query.filter((Message.expiration == None) | (Message.expiration > datetime.utcnow()))
-        
-        messages = query.order_by(Message.timestamp.asc()).limit(limit).all()
+        if channel_id.startswith("dm_") and await db.run_sync(mark_dm_read, channel_id, current_user.id):
+            await db.commit()
+
+        if after_id is not None and after_id >= archived_last_id and not message_writer.enabled:
+            # Bounded walk down the (channel_id, id) index: the oldest recent row near the cursor
+            recent = (
+                select(Message.id, Message.timestamp)
+                .where(Message.channel_id == channel_id, Message.id <= after_id)
+                .order_by(Message.id.desc()).limit(POLL_OVERLAP_ROWS).subquery()
+            )
+            overlap_id = (await db.execute(
+                select(func.min(recent.c.id)).where(recent.c.timestamp >= datetime.utcnow() - POLL_OVERLAP)
+            )).scalar()
+            if overlap_id is not None:
+                after_id = overlap_id - 1
+
+        if after_id is not None and after_id >= archived_last_id:
+            # Cheap probe first: an idle poll is answered from the (channel_id, id) index alone
+            newer = (await db.execute(
+                select(Message.id).where(Message.channel_id == channel_id, Message.id > after_id).limit(1)
+            )).first()
+            if newer is None:
+                return []
+
+        query = MESSAGE_PAGE.where(_messages.c.channel_id == channel_id)
+        # Core execution on the session's connection: plain rows, no ORM loading
+        connection = await db.connection()
+        if after_id is not None:
+            query = query.where(_messages.c.id > after_id).order_by(_messages.c.id.asc()).limit(limit)
+            rows = (await connection.execute(query)).all()
+        else:
+            if before_id is not None:
+                query = query.where(_messages.c.id < before_id)
+            # Walk backwards from the cursor, then flip to chronological order
+            rows = (await connection.execute(query.order_by(_messages.c.id.desc()).limit(limit))).all()
+            rows.reverse()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-        
-    response_messages = []
-    for msg in messages:
-        # Determine sender type
-        sender_type = "me" if msg.sender_id == current_user.id else "them"
-        
-        # Determine status
-        status = "blocked" if msg.is_blocked else "sent"
-        
-        # Build risk object - always include threat analysis data
-        risk = {
-            "ai_score": msg.ai_score if msg.ai_score is not None else 0.0,
-            "opsec_risk": msg.opsec_risk if msg.opsec_risk else "SAFE",
-            "phishing_risk": msg.phishing_risk if msg.phishing_risk else "LOW",
-            "explanation": "Analysis complete"
-        }
 
-        reply_to_data = None
-        if msg.reply_to:
-            reply_sender_type = "me" if msg.reply_to.sender_id == current_user.id else "them"
-            reply_to_data = {
-                "id": msg.reply_to.id,
-                "text": msg.reply_to.content_encrypted,
-                "sender": reply_sender_type
-            }
-
-        response_messages.append({
-            "id": msg.id,
-            "text": msg.content_encrypted, # In real app, decrypt here or on client
-            "sender": sender_type,
-            "timestamp": msg.timestamp,
-            "status": status,
-            "risk": risk,
-            "file_url": msg.file_url,
-            "file_type": msg.file_type,
-            "file_size": msg.file_size,
-            "integrity_hash": msg.integrity_hash,
-            "reply_to": reply_to_data,
-            "is_deleted": msg.is_deleted
-        })
-        
-    return response_messages
+    # The TTL reaper deletes expired rows; hide the few it has not reached yet
+    now = datetime.utcnow()
+    response_messages = [
+        page_row_for_viewer(row, current_user.id) for row in rows
+        if row.expiration is None or row.expiration > now
+    ]
+
+    # Read-through: only touch the archive when the page runs past the hot range
+    archived = []
+    if after_id is not None and after_id < archived_last_id:
+        archived = await asyncio.to_thread(message_archive.read, channel_id, limit, after_id=after_id)
+    elif after_id is None and len(rows) < limit and archived_last_id:
+        cursor = rows[0].id if rows else before_id
+        archived = await asyncio.to_thread(message_archive.read, channel_id, limit - len(rows), before_id=cursor)
+    if archived:
+        archived = [
+            for_viewer(archived_event(r), current_user.id) for r in archived
+            if not r["expiration"] or datetime.fromisoformat(r["expiration"]) > now
+        ]
+        response_messages = (archived + response_messages)[:limit]
+
+    # Rows are plain values already; serialize without the jsonable_encoder pass
+    return FastJSONResponse(response_messages)
+
+
+@router.get("/search")
+async def search(
+    q: str,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    channel_id: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None
+):
+    """
+    Full-text search over message content, best match first (all words must match,
+    the last one also as a prefix). Served from the FTS5 / tsvector index, never a LIKE scan.
+    Pass `next_cursor` back as `cursor` for the following page.
+    """
+    if channel_id is not None and not can_access_channel(current_user.id, channel_id):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+    dialect = db.bind.dialect.name
+    if dialect not in SEARCH_DIALECTS:
+        raise HTTPException(status_code=501, detail=f"Full-text search is not available on {dialect}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        rows, next_cursor = await search_messages(db, current_user.id, q, channel_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = []
+    for msg, score in rows:
+        event = message_event(msg)
+        results.append({**for_viewer(event, current_user.id), "channel_id": event["channel_id"], "score": score})
+    return {"results": results, "next_cursor": next_cursor}
+
+
+@router.get("/reaper/stats")
+def get_reaper_stats(current_user: deps.Principal = Depends(deps.get_current_user)):
+    """
+    Counters of the expired-message reaper: rows reaped, run time and lag.
+    """
+    return ttl_reaper.stats()
+
+
+@router.get("/archive/stats")
+def get_archive_stats(current_user: deps.Principal = Depends(deps.get_current_user)):
+    """
+    Counters of the cold-storage archiver and its segment cache.
+    """
+    return archive_scheduler.stats()
 
 
 class DeleteMessageRequest(BaseModel):
@@ -186,13 +306,13 @@ class DeleteMessageRequest(BaseModel):
     mode: str # "me" or "everyone"
 
 @router.post("/messages/delete")
-def delete_message(
+async def delete_message(
     request: DeleteMessageRequest,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_user)
 ):
     msg_id = int(request.id)
-    msg = db.query(Message).filter(Message.id == msg_id).first()
+    msg = await db.get(Message, msg_id)
     
     if not msg:
         raise HTTPException(status_code=404, detail="Message not found")
@@ -200,9 +320,73 @@ def delete_message(
     if request.mode == "everyone":
         # Only sender can delete for everyone in an ideal world, but let's just mark it
         msg.is_deleted = True
-        db.commit()
+        await db.commit()
     elif request.mode == "me":
         # Just a frontend hide for now or you can implement local hide table
         pass
         
     return {"success": True}
+
+
+@router.websocket("/ws")
+async def chat_ws(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    channel_id: List[str] = Query(default=["general"])
+):
+    """
+    Push channel for new messages.
+    Authenticate once with `?token=` (or an Authorization: Bearer header), subscribe with
+    `channel_id` query params, and send {"action": "subscribe"|"unsubscribe", "channel_id": ...}
+    to change subscriptions. Each committed message arrives as {"type": "message", ...}.
+    """
+    if token is None:
+        auth_header = websocket.headers.get("authorization", "")
+        if auth_header.lower().startswith("bearer "):
+            token = auth_header[7:]
+
+    try:
+        if db_session.AsyncSessionLocal is None:
+            raise HTTPException(status_code=503, detail="Async database unavailable")
+        async with db_session.AsyncSessionLocal() as db:
+            user_id = (await deps.get_user_from_token(token or "", db)).id
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    sub = Subscription(user_id)
+    chat_broker.subscribe(sub, [c for c in channel_id if can_access_channel(user_id, c)])
+
+    async def reader():
+        while True:
+            command = await websocket.receive_json()
+            target = str(command.get("channel_id", ""))
+            if command.get("action") == "subscribe" and can_access_channel(user_id, target):
+                chat_broker.subscribe(sub, [target])
+            elif command.get("action") == "unsubscribe":
+                chat_broker.unsubscribe(sub, [target])
+            await websocket.send_json({"type": "subscribed", "channels": sorted(sub.channels)})
+
+    async def writer():
+        await websocket.send_json({"type": "subscribed", "channels": sorted(sub.channels)})
+        while not sub.overflowed:
+            event = await sub.queue.get()
+            await websocket.send_json({"type": "message", "channel_id": event["channel_id"], **for_viewer(event, user_id)})
+
+    tasks = [asyncio.create_task(reader()), asyncio.create_task(writer())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            # Disconnects surface here as WebSocketDisconnect; nothing else to do
+            if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"Chat websocket error: {task.exception()}")
+        if sub.overflowed:
+            # Client fell too far behind; it should reconnect and resync via /messages
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    finally:
+        for task in tasks:
+            task.cancel()
+        chat_broker.unsubscribe(sub)
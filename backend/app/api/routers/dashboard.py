@@ -1,21 +1,104 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.api import deps
+from app.core.cache import SingleFlightCache
+from app.core.config import settings
+from app.db import session as db_session
 from app.models.message import Message
 from app.models.user import User
+from app.services.dashboard_stream import DashboardHub, sse_event
+from app.services.threat_counters import load_threat_counters, threat_counters
+from app.services.rollups import parse_duration, refresh_if_stale, threat_series
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, select
 import random
 
 router = APIRouter()
 
+# Every open dashboard asks for the same payload; share it for a short TTL
+stats_cache = SingleFlightCache(ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+async def _with_session(compute, *args):
+    # Shared computations outlive the request that started them, so they open their own session
+    if db_session.AsyncSessionLocal is None:
+        raise HTTPException(status_code=503, detail=f"Async database unavailable: {db_session.ASYNC_DB_ERROR}")
+    async with db_session.AsyncSessionLocal() as db:
+        return await compute(db, *args)
+
 @router.get("/stats")
-def get_dashboard_stats(db: Session = Depends(deps.get_db)):
+async def get_dashboard_stats(
+    window: Optional[str] = None,
+    resolution: Optional[str] = None,
+    channel_id: Optional[str] = None
+):
+    """
+    Dashboard stats. Without `window` the trend is the live last hour in 5-minute
+    buckets; with e.g. `window=24h&resolution=15m` (or 7d / 30d) it comes from the
+    message_rollups table plus a SQL-bucketed tail, optionally for one channel.
+    Responses are shared between viewers for DASHBOARD_CACHE_TTL_SECONDS.
+    """
+    key = (window, resolution, channel_id)
+    return await stats_cache.get_or_compute_async(key, lambda: _with_session(build_stats, window, resolution, channel_id))
+
+@router.get("/cache/stats")
+def get_stats_cache_stats():
+    return stats_cache.stats()
+
+async def build_stats(db: AsyncSession, window: Optional[str], resolution: Optional[str], channel_id: Optional[str]) -> dict:
+    stats = await compute_dashboard_stats(db)
+    if window is None:
+        return stats
+
+    try:
+        window_seconds = parse_duration(window)
+        if resolution is None:
+            # Aim for ~24 points, rounded up to whole 5-minute buckets
+            resolution_seconds = max(300, -(-window_seconds // 24 // 300) * 300)
+        else:
+            resolution_seconds = parse_duration(resolution)
+        series = await db.run_sync(rollup_series, window_seconds, resolution_seconds, channel_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    time_format = "%H:%M" if window_seconds <= 86400 else "%m-%d %H:%M"
+    stats["trend_data"] = [
+        {"time": p["time"].strftime(time_format), "value": p["value"], "total": p["total"]}
+        for p in series
+    ]
+    stats["window"] = window
+    stats["resolution"] = f"{resolution_seconds // 60}m"
+    return stats
+
+def rollup_series(db: Session, window_seconds: int, resolution_seconds: int, channel_id: Optional[str]) -> list:
+    # Rollup maintenance is shared with the sync tooling; runs via AsyncSession.run_sync
+    refresh_if_stale(db, settings.ROLLUP_REFRESH_SECONDS)
+    return threat_series(db, window_seconds, resolution_seconds, channel_id=channel_id)
+
+def _noise(seed, low: int, high: int) -> int:
+    # Cosmetic jitter seeded by the bucket / minute it decorates: identical on every
+    # tick until that value really changes, so the SSE stream does not resend it
+    return random.Random(str(seed)).randint(low, high)
+
+async def compute_dashboard_stats(db: AsyncSession) -> dict:
     now = datetime.utcnow()
     one_hour_ago = now - timedelta(hours=1)
     
     # 1. Calculate DEFCON
-    active_threats = db.query(Message).filter(Message.opsec_risk == "HIGH", Message.timestamp > one_hour_ago).count()
+    # Live counters are updated at scan time and re-seeded from the DB for other workers'
+    # scans; without them (disabled, or not loaded yet) the same numbers come from SQL
+    reseed_seconds = settings.THREAT_COUNTERS_RESEED_SECONDS
+    if reseed_seconds > 0 and threat_counters.age() >= reseed_seconds:
+        await db.run_sync(load_threat_counters)
+    use_counters = reseed_seconds > 0 and threat_counters.ready
+    if use_counters:
+        active_threats = threat_counters.active_threats(now)
+    else:
+        active_threats = (await db.execute(
+            select(func.count(Message.id)).where(Message.opsec_risk == "HIGH", Message.timestamp > one_hour_ago)
+        )).scalar_one()
     
     defcon = 4
     if active_threats > 10:
@@ -24,26 +107,32 @@ def get_dashboard_stats(db: Session = Depends(deps.get_db)):
         defcon = 3
         
     # 2. Threat Trend
-    # Get messages from last hour
-    recent_msgs = db.query(Message).filter(Message.timestamp > one_hour_ago).all()
-    
-    # Group by minute for chart (simple approximation)
-    # We need a list of data points.
-    # Format: { time: "HH:MM", threats: count }
-    trend_data = []
-    # Buckets every 10 mins? Or just last 10 messages?
-    # Let's mock a curve based on real count + noise for "Live" feel
-    base_activity = len(recent_msgs)
-    for i in range(10):
-        t = now - timedelta(minutes=(10-i)*5)
-        count = sum(1 for m in recent_msgs if m.timestamp > t and m.timestamp < t + timedelta(minutes=5) and m.opsec_risk != "SAFE")
-        trend_data.append({
-            "time": t.strftime("%H:%M"),
-            "value": count + random.randint(0, 2) # Add noise for "live" look
-        })
+    # Format: { time: "HH:MM", threats: count }, 10 buckets of 5 minutes.
+    # Bucket edges sit on the 5-minute clock, so between ticks only the current bucket
+    # changes and the stream sends a shifted window as one new item
+    trend_end = now.replace(second=0, microsecond=0) + timedelta(minutes=5 - now.minute % 5)
+    if use_counters:
+        buckets = threat_counters.trend(trend_end)
+    else:
+        recent_msgs = (await db.execute(
+            select(Message.timestamp, Message.opsec_risk).where(Message.timestamp > one_hour_ago)
+        )).all()
+        buckets = []
+        for i in range(10):
+            t = trend_end - timedelta(minutes=(10-i)*5)
+            count = sum(1 for m in recent_msgs if m.timestamp > t and m.timestamp < t + timedelta(minutes=5) and m.opsec_risk != "SAFE")
+            buckets.append({"time": t, "value": count})
+    trend_data = [
+        {
+            "time": b["time"].strftime("%H:%M"),
+            "value": b["value"] + _noise(b["time"], 0, 2) # Add noise for "live" look
+        } for b in buckets
+    ]
 
     # 3. Active Alerts
-    db_alerts = db.query(Message).filter(Message.opsec_risk == "HIGH").order_by(Message.timestamp.desc()).limit(5).all()
+    db_alerts = (await db.execute(
+        select(Message).where(Message.opsec_risk == "HIGH").order_by(Message.timestamp.desc()).limit(5)
+    )).scalars().all()
     alerts = [
         {
             "id": m.id,
@@ -58,7 +147,7 @@ def get_dashboard_stats(db: Session = Depends(deps.get_db)):
     # Mix of real message logs and system noise
     logs = []
     # Add real recent activity
-    last_10 = db.query(Message).order_by(Message.timestamp.desc()).limit(10).all()
+    last_10 = (await db.execute(select(Message).order_by(Message.timestamp.desc()).limit(10))).scalars().all()
     for m in last_10:
         tag = "[WARN]" if m.opsec_risk == "HIGH" else "[INFO]"
         text = f"Threat Detected: {m.opsec_risk}" if m.opsec_risk != "SAFE" else f"Secure message processed ({len(m.content_encrypted)} bytes)"
@@ -75,18 +164,19 @@ def get_dashboard_stats(db: Session = Depends(deps.get_db)):
         "Group Key #882 Updated",
         "Latency check: 12ms"
     ]
+    minute = now.replace(second=0, microsecond=0)
     while len(logs) < 10:
         logs.append({
-            "time": datetime.utcnow().strftime("%H:%M:%S"),
+            "time": minute.strftime("%H:%M:%S"),
             "type": "[SYS]",
-            "message": random.choice(system_fillers)
+            "message": system_fillers[_noise((minute, len(logs)), 0, len(system_fillers) - 1)]
         })
         
     logs.sort(key=lambda x: x["time"], reverse=True)
 
     return {
         "system_status": "OPERATIONAL" if defcon > 2 else "CRITICAL",
-        "active_nodes": 1204 + active_threats * 15 + random.randint(-5, 5),
+        "active_nodes": 1204 + active_threats * 15 + _noise(minute, -5, 5),
         "defcon": defcon,
         "active_threats": active_threats,
         "trend_data": trend_data,
@@ -94,6 +184,40 @@ def get_dashboard_stats(db: Session = Depends(deps.get_db)):
         "logs": logs[:10],
         # Geolocation Mock Data (simulated based on threats)
         "geo_risks": [
-            {"lat": 19.076 + random.uniform(-0.1, 0.1), "lng": 72.877 + random.uniform(-0.1, 0.1), "risk": "HIGH"} for _ in range(active_threats or 1)
+            {"lat": 19.076 + random.Random(f"lat{i}").uniform(-0.1, 0.1),
+             "lng": 72.877 + random.Random(f"lng{i}").uniform(-0.1, 0.1), "risk": "HIGH"} for i in range(active_threats or 1)
         ]
     }
+
+
+async def _snapshot() -> dict:
+    return await stats_cache.get_or_compute_async((None, None, None), lambda: _with_session(compute_dashboard_stats))
+
+dashboard_hub = DashboardHub(_snapshot, tick_seconds=settings.DASHBOARD_TICK_SECONDS)
+
+@router.get("/stream")
+async def stream_dashboard_stats():
+    """
+    Server-Sent Events feed of dashboard stats.
+    The first event ("snapshot") carries the full payload; later "update" events
+    carry only what changed since the previous tick: replaced fields under "set",
+    list fields as splices of the previous list under "splice" (see DashboardHub).
+    """
+    async def events():
+        queue = await dashboard_hub.connect()
+        try:
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(kind, data)
+        finally:
+            dashboard_hub.disconnect(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.services.threat_intel import scan_message
+from app.services.scan_executor import scan_executor
+from app.services.threat_intel import RULESET_VERSION
 from app.api import deps
+from app.core.config import settings
+from app.services.message_events import message_event
+from app.services.chat_broker import chat_broker
+from app.services.dm_channels import record_dm_message
+from app.services.idempotency import idempotency_keys, recent_hashes
+from app.services.message_writer import message_writer
+from app.services.threat_counters import threat_counters
 from app.models.user import User
 from app.models.message import Message
 from datetime import datetime, timedelta
@@ -26,74 +38,263 @@ class ScanResponse(BaseModel):
     phishing_risk: str
     explanation: str
 
-@router.post("/scan", response_model=ScanResponse)
-async def scan(
-    request: ScanRequest,
-    current_user: User = Depends(deps.get_current_user),
-    db: Session = Depends(deps.get_db)
-):
-    # DEDUPLICATION: Prevent duplicate messages from race conditions
-    if request.integrity_hash:
-        recent_duplicate = db.query(Message).filter(
-            Message.sender_id == current_user.id,
-            Message.integrity_hash == request.integrity_hash,
-            Message.timestamp > datetime.utcnow() - timedelta(seconds=10)
-        ).first()
-        
-        if recent_duplicate:
-            # If we already have this message, return the existing result instead of saving twice
-            return {
-                "message_id": recent_duplicate.id,
-                "ai_score": recent_duplicate.ai_score or 0.0,
-                "opsec_risk": recent_duplicate.opsec_risk or "SAFE",
-                "phishing_risk": recent_duplicate.phishing_risk or "LOW",
-                "explanation": "Duplicate message recognized and merged."
-            }
+# Upper bound on items per /scan/batch call, keeps one transaction reasonably sized
+MAX_BATCH_SIZE = 500
 
-    # Perform scan
-    result = await scan_message(request.lines)
-    
-    # Save to Database for HQ Dashboard
+def dm_receiver_id(channel_id: str, sender_id: int) -> int | None:
     # Determine Receiver ID for DMs
-    receiver_id = None
-    if request.channel_id.startswith("dm_"):
-        try:
-            parts = request.channel_id.split("_")
-            if len(parts) == 3:
-                u1, u2 = int(parts[1]), int(parts[2])
-                if current_user.id == u1:
-                    receiver_id = u2
-                elif current_user.id == u2:
-                    receiver_id = u1
-        except:
-            pass
-
-    risk_score = result["ai_score"]
-    opsec_risk = result["opsec_risk"]
-    phishing_risk = result["phishing_risk"]
-    is_blocked = result["opsec_risk"] == "HIGH"
-
-    db_message = Message(
-        sender_id=current_user.id,
+    if not channel_id.startswith("dm_"):
+        return None
+    try:
+        parts = channel_id.split("_")
+        if len(parts) == 3:
+            u1, u2 = int(parts[1]), int(parts[2])
+            if sender_id == u1:
+                return u2
+            elif sender_id == u2:
+                return u1
+    except:
+        pass
+    return None
+
+def build_message(request: ScanRequest, sender_id: int, result: dict) -> Message:
+    return Message(
+        sender_id=sender_id,
         content_encrypted=request.lines, # In real app, this would be encrypted on client
-        ai_score=risk_score,
-        opsec_risk=opsec_risk,
-        phishing_risk=phishing_risk,
-        is_blocked=is_blocked,
+        ai_score=result["ai_score"],
+        opsec_risk=result["opsec_risk"],
+        phishing_risk=result["phishing_risk"],
+        is_blocked=result["opsec_risk"] == "HIGH",
         file_url=request.file_url,
         file_type=request.file_type,
         file_size=request.file_size,
         integrity_hash=request.integrity_hash,
         channel_id=request.channel_id,
-        receiver_id=receiver_id,
+        receiver_id=dm_receiver_id(request.channel_id, sender_id),
         reply_to_id=request.reply_to_id,
         expiration=datetime.utcnow() + timedelta(seconds=request.ttl_seconds) if request.ttl_seconds else None
     )
-    db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+
+def duplicate_response(message: Message) -> dict:
+    # If we already have this message, return the existing result instead of saving twice
+    return {
+        "message_id": message.id,
+        "ai_score": message.ai_score or 0.0,
+        "opsec_risk": message.opsec_risk or "SAFE",
+        "phishing_risk": message.phishing_risk or "LOW",
+        "explanation": "Duplicate message recognized and merged."
+    }
+
+async def recent_duplicates(db: AsyncSession, sender_id: int, hashes, in_flight=()) -> dict:
+    """
+    Database check for integrity hashes the in-memory index cannot vouch for:
+    right after a restart, when instances do not share memory, or when another
+    request holds the hash in flight (`in_flight`, always checked).
+    """
+    if not (recent_hashes.warm and not settings.DEDUP_ALWAYS_CHECK_DB):
+        in_flight = [*hashes, *in_flight]
+    if not in_flight:
+        return {}
+    duplicates = (await db.execute(select(Message).where(
+        Message.sender_id == sender_id,
+        Message.integrity_hash.in_(in_flight),
+        Message.timestamp > datetime.utcnow() - timedelta(seconds=settings.DEDUP_WINDOW_SECONDS)
+    ))).scalars().all()
+    return {m.integrity_hash: duplicate_response(m) for m in duplicates}
+
+async def scan_and_store(request: ScanRequest, sender_id: int, db: AsyncSession) -> dict:
+    # Perform scan
+    result = await scan_executor.scan(request.lines)
+    
+    # Save to Database for HQ Dashboard
+    db_message = build_message(request, sender_id, result)
+
+    def after_flush(session: Session):
+        # Flush assigned id and timestamp; membership counters commit with the message
+        if db_message.channel_id.startswith("dm_"):
+            record_dm_message(session, db_message.channel_id, sender_id, db_message.timestamp)
+        if chat_broker.subscriber_count(db_message.channel_id):
+            return message_event(db_message)
+        return None
+
+    # Through the single writer / group commit when enabled, otherwise inline on `db`;
+    # returns once the row is committed
+    event = await message_writer.insert([db_message], db, after=after_flush)
+    threat_counters.record(db_message.timestamp, db_message.opsec_risk)
+
+    # Push to live WebSocket subscribers only after the row is durable
+    if event is not None:
+        chat_broker.publish(db_message.channel_id, event)
     
     return {
         "message_id": db_message.id,
         **result
     }
+
+
+@router.post("/scan", response_model=ScanResponse)
+async def scan(
+    request: ScanRequest,
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    idempotency_key: str | None = Header(default=None),
+):
+    # DEDUPLICATION: retries and double-submits are answered from memory, no query.
+    # Every key is looked up (waiting for an identical request in flight) before any is claimed
+    keys = [(index, key) for index, key in ((idempotency_keys, idempotency_key), (recent_hashes, request.integrity_hash)) if key]
+    claims = []
+    try:
+        response = None
+        for index, key in keys:
+            response = await index.lookup(current_user.id, key)
+            if response is not None:
+                break
+        busy = []
+        if response is None:
+            # Claim the misses without awaiting in between; a key another request took
+            # meanwhile stays unclaimed and falls back to the database check
+            for index, key in keys:
+                stored, claimed = index.claim(current_user.id, [key])
+                response = response or stored.get(key)
+                claims.extend((index, k) for k in claimed)
+                if index is recent_hashes and not claimed and not stored:
+                    busy.append(key)
+        if response is None and request.integrity_hash:
+            hashes = [key for index, key in claims if index is recent_hashes]
+            response = (await recent_duplicates(db, current_user.id, hashes, busy)).get(request.integrity_hash)
+
+        duplicate = response
+        if response is None:
+            response = await scan_and_store(request, current_user.id, db)
+            duplicate = {**response, "explanation": "Duplicate message recognized and merged."}
+        for index, key in claims:
+            index.complete(current_user.id, key, duplicate if index is recent_hashes else response)
+        return response
+    finally:
+        # No-op for completed keys; waiters of a failed request retry on their own
+        for index, key in claims:
+            index.abort(current_user.id, key)
+
+
+@router.post("/scan/batch", response_model=List[ScanResponse])
+async def scan_many(
+    requests: List[ScanRequest],
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    idempotency_key: str | None = Header(default=None),
+):
+    """
+    Scan a batch of messages (relay bots) and persist them in one transaction.
+    Results are returned in the same order as the input.
+    """
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {MAX_BATCH_SIZE})")
+    if not requests:
+        return []
+
+    hashes = list(dict.fromkeys(r.integrity_hash for r in requests if r.integrity_hash))
+    claims = []
+    try:
+        # Look every key up before claiming any: waiting for another request while
+        # holding claims of our own is how overlapping batches deadlock.
+        # A retried batch (same Idempotency-Key) gets the whole first response back
+        if idempotency_key:
+            prior = await idempotency_keys.lookup(current_user.id, idempotency_key)
+            if prior is not None:
+                return prior
+        # DEDUPLICATION: integrity hashes from memory, the database only for the rest
+        priors = await asyncio.gather(*(recent_hashes.lookup(current_user.id, key) for key in hashes))
+        known = {key: prior for key, prior in zip(hashes, priors) if prior is not None}
+
+        # Claim the misses in one synchronous step; keys another request claimed
+        # since the lookup are not waited for but checked in the database
+        if idempotency_key:
+            stored, claimed = idempotency_keys.claim(current_user.id, [idempotency_key])
+            if stored:
+                return stored[idempotency_key]
+            claims.extend((idempotency_keys, key) for key in claimed)
+        stored, claimed = recent_hashes.claim(current_user.id, [key for key in hashes if key not in known])
+        known.update(stored)
+        claims.extend((recent_hashes, key) for key in claimed)
+        busy = [key for key in hashes if key not in known and key not in claimed]
+        known.update(await recent_duplicates(db, current_user.id, claimed, busy))
+
+        # Only scan items that are neither known duplicates nor repeated inside this batch
+        pending = []
+        seen = set()
+        for index, request in enumerate(requests):
+            key = request.integrity_hash
+            if key and (key in known or key in seen):
+                continue
+            if key:
+                seen.add(key)
+            pending.append(index)
+
+        results = await scan_executor.scan_batch([requests[i].lines for i in pending])
+
+        db_messages = [build_message(requests[i], current_user.id, result) for i, result in zip(pending, results)]
+
+        def after_flush(session: Session):
+            for db_message in db_messages:
+                if db_message.channel_id.startswith("dm_"):
+                    record_dm_message(session, db_message.channel_id, current_user.id, db_message.timestamp)
+            return [message_event(m) for m in db_messages if chat_broker.subscriber_count(m.channel_id)]
+
+        # The writer flushes all rows as a single executemany INSERT
+        events = await message_writer.insert(db_messages, db, after=after_flush)
+
+        responses: List[dict | None] = [None] * len(requests)
+        for i, result, db_message in zip(pending, results, db_messages):
+            responses[i] = {"message_id": db_message.id, **result}
+            if requests[i].integrity_hash:
+                known[requests[i].integrity_hash] = duplicate_response(db_message)
+
+        for m in db_messages:
+            threat_counters.record(m.timestamp, m.opsec_risk)
+
+        for event in events:
+            chat_broker.publish(event["channel_id"], event)
+
+        for index, request in enumerate(requests):
+            if responses[index] is None:
+                responses[index] = known[request.integrity_hash]
+
+        for index, key in claims:
+            index.complete(current_user.id, key, responses if index is idempotency_keys else known[key])
+        return responses
+    finally:
+        for index, key in claims:
+            index.abort(current_user.id, key)
+
+
+@router.get("/writer/stats")
+def message_writer_stats(current_user: deps.Principal = Depends(deps.get_current_user)):
+    """
+    Batching counters of the message insert writer (group commit).
+    """
+    return message_writer.stats()
+
+
+@router.get("/idempotency/stats")
+def idempotency_stats(current_user: deps.Principal = Depends(deps.get_current_user)):
+    """
+    Hit counters of the in-memory duplicate-submit indexes.
+    """
+    return {
+        "integrity_hashes": recent_hashes.stats(),
+        "idempotency_keys": idempotency_keys.stats(),
+        "always_check_db": settings.DEDUP_ALWAYS_CHECK_DB,
+    }
+
+
+@router.get("/cache/stats")
+def scan_cache_stats(current_user: deps.Principal = Depends(deps.get_current_user)):
+    """
+    Hit/miss counters of the content-addressed scan result cache.
+    """
+    cache = scan_executor.cache
+    return {
+        "enabled": cache is not None,
+        "ruleset_version": RULESET_VERSION,
+        **(cache.stats() if cache is not None else {}),
+    }
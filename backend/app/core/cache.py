@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry time-to-live and hit/miss counters.
+    Safe to share between the event loop and threadpool endpoints.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_MISSING = object()
+
+
+class SingleFlightCache:
+    """
+    TTL cache where concurrent misses for the same key share one computation.
+
+    The first caller starts the computation as a task; later callers await that
+    in-flight task instead of starting their own, so N simultaneous requests
+    cost one recompute.
+    """
+
+    def __init__(self, max_size: int = 64, ttl_seconds: float = 1.5):
+        self.cache = TTLCache(max_size, ttl_seconds)
+        self.computations = 0
+        self.failures = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get_or_compute_async(self, key: Hashable, compute) -> Any:
+        """
+        `compute` runs as a detached task that every caller, the first one
+        included, awaits through a shield: a disconnecting client cancels only its
+        own wait. The computation therefore must not use request-scoped state
+        such as the caller's database session.
+        """
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            pending = asyncio.ensure_future(compute())
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda task: self._settle(key, task))
+        return await asyncio.shield(pending)
+
+    def _settle(self, key: Hashable, task: asyncio.Future) -> None:
+        # Runs even when every caller has gone, so the result still lands in the cache
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            self.failures += 1
+            return
+        self.computations += 1
+        self.cache.set(key, task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        # Every request was a cache hit, started a computation (successful or not)
+        # or joined one in flight. hit_ratio is the share that started none
+        started = self.computations + self.failures
+        served = self.cache.hits + started + self.coalesced
+        return {
+            "size": stats["size"],
+            "ttl_seconds": stats["ttl_seconds"],
+            "requests": served,
+            "computations": self.computations,
+            "failures": self.failures,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(1 - started / served, 4) if served else 0.0,
+        }
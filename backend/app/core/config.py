@@ -1,3 +1,6 @@
+import os
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,6 +8,70 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = "CHANGE_THIS_TO_A_SECURE_RANDOM_KEY"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # Authenticated-principal cache (token -> user). Users are only changed in the database,
+    # never through the API, so this TTL is how long a role change takes to apply; 0 disables
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # Apply pending schema migrations at startup. Off by default with DATABASE_URL, where
+    # `python migrate.py` runs on deploy and a database that is behind stops the startup
+    AUTO_MIGRATE: bool = not os.getenv("DATABASE_URL")
+
+    # Threat scanning: "inline" (on the event loop), "thread" or "process"
+    SCAN_EXECUTOR: str = "thread"
+    SCAN_POOL_SIZE: int = 0  # 0 = one worker per CPU core
+    # Seed the simulated model confidence from the text so repeated texts score identically
+    SCAN_DETERMINISTIC: bool = True
+    # Content-addressed scan result cache (only used in deterministic mode; 0 disables)
+    SCAN_CACHE_SIZE: int = 4096
+    SCAN_CACHE_TTL_SECONDS: int = 600
+
+    # HQ dashboard SSE stream: one shared snapshot per tick
+    DASHBOARD_TICK_SECONDS: float = 3.0
+    # Shared /dashboard/stats response lifetime (single-flight recompute on expiry)
+    DASHBOARD_CACHE_TTL_SECONDS: float = 1.5
+    # Fold new messages into message_rollups at most this often (on windowed stats requests)
+    ROLLUP_REFRESH_SECONDS: float = 60.0
+    # Live threat counters only see this process's scans: re-seed them from the database
+    # this often so other workers' scans show up. 0 skips them and queries the database
+    # on every stats recompute (the default with several instances, e.g. Vercel).
+    THREAT_COUNTERS_RESEED_SECONDS: float = 0.0 if os.getenv("VERCEL") else 30.0
+
+    # SQLite (local/Vercel) profile: WAL + pragmas on connect, message inserts through one writer
+    SQLITE_PERFORMANCE_PROFILE: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_SINGLE_WRITER: bool = True
+
+    # Group commit: queue message inserts and commit up to N rows (or every T ms) in one transaction
+    MESSAGE_GROUP_COMMIT: bool = False
+    GROUP_COMMIT_MAX_ROWS: int = 64
+    GROUP_COMMIT_MAX_DELAY_MS: float = 5.0
+
+    # Duplicate submits are answered from memory: same sender + integrity_hash within
+    # DEDUP_WINDOW_SECONDS, or a repeated Idempotency-Key header within its TTL.
+    # The database is only checked until one window has passed after startup, unless
+    # DEDUP_ALWAYS_CHECK_DB (several API instances that do not share memory, e.g. Vercel).
+    DEDUP_WINDOW_SECONDS: float = 10.0
+    IDEMPOTENCY_KEY_TTL_SECONDS: float = 600.0
+    IDEMPOTENCY_MAX_ENTRIES: int = 100000
+    # Longest a duplicate waits for the in-flight original before processing it itself
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0
+    DEDUP_ALWAYS_CHECK_DB: bool = bool(os.getenv("VERCEL"))
+
+    # Background deletion of expired (self-destructing) messages; 0 disables
+    TTL_REAPER_INTERVAL_SECONDS: float = 5.0
+    TTL_REAPER_CHUNK_SIZE: int = 500
+
+    # Cold storage: move messages older than N days into compressed segment files.
+    # 0 disables; ARCHIVE_CHANNEL_DAYS overrides per channel, e.g. {"general": 7}.
+    # ARCHIVE_DIR must be persistent and shared by every API instance.
+    ARCHIVE_AFTER_DAYS: float = 0
+    ARCHIVE_CHANNEL_DAYS: Dict[str, float] = {}
+    ARCHIVE_DIR: str = "/tmp/sentinelnet_archive" if os.getenv("VERCEL") else "./archive"
+    ARCHIVE_SEGMENT_ROWS: int = 5000
+    ARCHIVE_INTERVAL_SECONDS: float = 3600.0
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,216 @@
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.core import security
+from app.models.user import User
+from app.models.message import Message
+from app.models.dm_channel import DMChannel
+from app.models.rollup import MessageRollup, RollupState
+from app.services.dm_channels import parse_dm_channel
+
+# Kept outside Base.metadata so create_all / drop_all never touch it
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def add_missing_columns(conn: Connection, table: str, columns: List[tuple]) -> None:
+    # Works on SQLite and Postgres alike: inspect first instead of ADD COLUMN IF NOT EXISTS
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for col_name, col_type in columns:
+        if col_name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}"))
+
+
+def create_missing_indexes(conn: Connection, table: Table) -> None:
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+# Every migration must be idempotent against the *current* models: on a fresh
+# database the baseline already creates tables in their latest shape.
+
+def _baseline(conn: Connection) -> None:
+    User.__table__.create(bind=conn, checkfirst=True)
+    Message.__table__.create(bind=conn, checkfirst=True)
+
+    # Old Vercel/Neon databases predate these columns
+    add_missing_columns(conn, "messages", [
+        ("file_url", "VARCHAR"),
+        ("file_type", "VARCHAR"),
+        ("file_size", "VARCHAR"),
+        ("integrity_hash", "VARCHAR"),
+        ("channel_id", "VARCHAR"),
+        ("expiration", "TIMESTAMP"),
+        ("receiver_id", "INTEGER"),
+        ("reply_to_id", "INTEGER"),
+        ("is_deleted", "BOOLEAN DEFAULT FALSE"),
+        ("ai_score", "FLOAT"),
+        ("opsec_risk", "VARCHAR"),
+        ("phishing_risk", "VARCHAR"),
+        ("is_blocked", "BOOLEAN DEFAULT FALSE"),
+    ])
+
+    # Default user for the Vercel demo
+    users = User.__table__
+    if conn.execute(select(users.c.id).where(users.c.email == "admin@sentinel.net")).first() is None:
+        conn.execute(users.insert().values(
+            email="admin@sentinel.net",
+            hashed_password=security.get_password_hash("admin"),
+            full_name="Commander Shepard",
+            role="admin",
+            is_active=True,
+            is_superuser=False,
+        ))
+
+
+def _message_query_indexes(conn: Connection) -> None:
+    create_missing_indexes(conn, Message.__table__)
+
+
+def _dm_channels(conn: Connection) -> None:
+    DMChannel.__table__.create(bind=conn, checkfirst=True)
+
+    # Backfill membership from existing DM traffic (one GROUP BY, not per-user scans)
+    messages = Message.__table__
+    members = DMChannel.__table__
+    user_ids = set(conn.execute(select(User.__table__.c.id)).scalars())
+    already = set(conn.execute(select(members.c.user_id, members.c.channel_id)).all())
+    rows = []
+    for channel_id, last_at in conn.execute(
+        select(messages.c.channel_id, func.max(messages.c.timestamp))
+        .where(messages.c.channel_id.like("dm_%"))
+        .group_by(messages.c.channel_id)
+    ):
+        pair = parse_dm_channel(channel_id)
+        if pair is None or not set(pair) <= user_ids:
+            continue
+        for user_id, peer_id in (pair, pair[::-1]):
+            if (user_id, channel_id) not in already:
+                rows.append({"channel_id": channel_id, "user_id": user_id, "peer_id": peer_id,
+                             "last_message_at": last_at, "unread_count": 0})
+    if rows:
+        conn.execute(members.insert(), rows)
+
+
+def _message_rollups(conn: Connection) -> None:
+    # Filled by refresh_rollups on first use; the tail query covers the gap until then
+    MessageRollup.__table__.create(bind=conn, checkfirst=True)
+    RollupState.__table__.create(bind=conn, checkfirst=True)
+
+
+def _reaper_indexes(conn: Connection) -> None:
+    create_missing_indexes(conn, Message.__table__)
+
+
+# Full-text search index over message content, kept in sync by the database itself,
+# so every insert, edit, reaper delete and archive delete is covered.
+SQLITE_SEARCH_DDL = [
+    # External-content FTS5 table: stores only the inverted index, rowid = messages.id
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content_encrypted, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content_encrypted) VALUES (new.id, new.content_encrypted);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content_encrypted) VALUES ('delete', old.id, old.content_encrypted);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content_encrypted ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content_encrypted) VALUES ('delete', old.id, old.content_encrypted);
+        INSERT INTO messages_fts(rowid, content_encrypted) VALUES (new.id, new.content_encrypted);
+    END""",
+    # Backfill (also repairs an index left over from a dropped messages table)
+    "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_SEARCH_DDL = [
+    # Generated column: maintained on every INSERT/UPDATE, gone with the row on DELETE
+    """ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content_encrypted, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)",
+]
+
+
+def _message_search(conn: Connection) -> None:
+    dialect = conn.dialect.name
+    statements = SQLITE_SEARCH_DDL if dialect == "sqlite" else POSTGRES_SEARCH_DDL if dialect == "postgresql" else []
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _drop_unused_message_indexes(conn: Connection) -> None:
+    # /chat/dms reads dm_channels now, and ix_messages_channel_id_id already serves
+    # channel_id lookups: these only cost a write on every insert
+    for name in ("ix_messages_sender_channel", "ix_messages_receiver_channel", "ix_messages_channel_id"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline users/messages schema and default admin", _baseline),
+    Migration(2, "composite and partial indexes on messages", _message_query_indexes),
+    Migration(3, "dm_channels membership table with backfill", _dm_channels),
+    Migration(4, "message_rollups history table", _message_rollups),
+    Migration(5, "expiration and reply_to indexes for the TTL reaper", _reaper_indexes),
+    Migration(6, "full-text search index on message content", _message_search),
+    Migration(7, "drop message indexes superseded by dm_channels", _drop_unused_message_indexes),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def current_version(engine: Engine) -> int:
+    """
+    One round trip: the recorded schema version, or 0 for an unmanaged database.
+    Connection errors are raised, not mistaken for an empty schema.
+    """
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_version.c.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # Only a missing schema_version table means "unmanaged"
+        if inspect(engine).has_table(schema_version.name):
+            raise
+        return 0
+
+
+def upgrade(engine: Engine, target: int = HEAD) -> List[Migration]:
+    """
+    Apply pending migrations up to `target`, each in its own transaction
+    together with the version bump. Returns the migrations that ran.
+    """
+    applied = []
+    with engine.begin() as conn:
+        schema_metadata.create_all(bind=conn)
+        if engine.dialect.name == "postgresql":
+            # Serialize concurrent cold starts / CLI runs
+            conn.execute(text("LOCK TABLE schema_version IN EXCLUSIVE MODE"))
+        version = conn.execute(select(schema_version.c.version)).scalar()
+        if version is None:
+            conn.execute(schema_version.insert().values(version=0))
+            version = 0
+
+    for migration in MIGRATIONS:
+        if migration.version <= version or migration.version > target:
+            continue
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                conn.execute(text("LOCK TABLE schema_version IN EXCLUSIVE MODE"))
+                # Another process may have applied it while we waited for the lock
+                if conn.execute(select(schema_version.c.version)).scalar() >= migration.version:
+                    continue
+            migration.upgrade(conn)
+            conn.execute(schema_version.update().values(version=migration.version))
+        applied.append(migration)
+    return applied
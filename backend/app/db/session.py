@@ -1,10 +1,13 @@
 import os
 import shutil
 import ssl
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app.core.config import settings
+
 # Prioritize connection string from environment variable
 DB_CONNECTION_ERROR = None
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -74,4 +77,61 @@ else:
             connect_args={"check_same_thread": False},
         )
 
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None) -> None:
+    """
+    SQLite performance profile, run on every new connection.
+    WAL lets readers proceed while a write is in progress; synchronous=NORMAL is
+    durable across application crashes (only a power loss can drop the last commits).
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+def configure_sqlite(sync_engine) -> None:
+    if sync_engine.dialect.name == "sqlite" and settings.SQLITE_PERFORMANCE_PROFILE:
+        event.listen(sync_engine, "connect", apply_sqlite_pragmas)
+
+configure_sqlite(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for async endpoints, pointed at the same database:
+# aiosqlite locally, asyncpg instead of the pure-Python pg8000 in production.
+ASYNC_DB_ERROR = None
+
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql+pg8000://"):
+        return url.replace("postgresql+pg8000://", "postgresql+asyncpg://", 1)
+    return url
+
+try:
+    ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+    if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg://"):
+        async_ssl_context = ssl.create_default_context()
+        async_ssl_context.check_hostname = False
+        async_ssl_context.verify_mode = ssl.CERT_NONE
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            connect_args={"ssl": async_ssl_context},
+            pool_pre_ping=True,
+            pool_recycle=300
+        )
+    else:
+        async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    configure_sqlite(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except Exception as e:
+    ASYNC_DB_ERROR = str(e)
+    print(f"ASYNC DATABASE ENGINE UNAVAILABLE: {e}")
+    async_engine = None
+    AsyncSessionLocal = None
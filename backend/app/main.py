@@ -16,7 +16,16 @@ from app.db.session import SessionLocal, engine, DB_CONNECTION_ERROR
 from app.db.base import Base
 from app.models.user import User
 from app.models.message import Message
+from app.models.dm_channel import DMChannel
+from app.models.rollup import MessageRollup, RollupState
 from app.core import security
+from app.core.config import settings
+from app.db import migrations
+from app.services.scan_executor import scan_executor
+from app.services.message_writer import message_writer
+from app.services.ttl_reaper import ttl_reaper
+from app.services.archive import archive_scheduler
+from app.api.routers.dashboard import dashboard_hub
 from sqlalchemy import text
 
 
@@ -29,61 +38,26 @@ from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
+    schema_error = None
     try:
         # Debug connection
         print(f"DATABASE CONNECTING TO: {str(engine.url).replace(str(engine.url).split('@')[0], '****') if '@' in str(engine.url) else str(engine.url)[:20]}...")
 
-        # Create tables on startup
+        # Schema check: one SELECT on schema_version when already at head.
+        # With DATABASE_URL, `python migrate.py` is an explicit deploy step (AUTO_MIGRATE
+        # defaults to false) and a database that is behind stops the boot below;
+        # local/Vercel SQLite databases are migrated here on first boot.
         # WRAPPED IN TRY/EXCEPT TO PREVENT CRASH ON VERCEL IF DB CONNECTION FAILS
         try:
-            Base.metadata.create_all(bind=engine)
-            
-            # Auto-Migrate Old Vercel/Neon DBs
-            try:
-                with engine.connect() as conn:
-                    columns_to_add = [
-                        ("file_url", "VARCHAR"),
-                        ("file_type", "VARCHAR"),
-                        ("file_size", "VARCHAR"),
-                        ("integrity_hash", "VARCHAR"),
-                        ("channel_id", "VARCHAR"),
-                        ("expiration", "TIMESTAMP"),
-                        ("receiver_id", "INTEGER"),
-                        ("reply_to_id", "INTEGER"),
-                        ("is_deleted", "BOOLEAN DEFAULT FALSE"),
-                        ("ai_score", "FLOAT"),
-                        ("opsec_risk", "VARCHAR"),
-                        ("phishing_risk", "VARCHAR"),
-                        ("is_blocked", "BOOLEAN DEFAULT FALSE")
-                    ]
-                    for col_name, col_type in columns_to_add:
-                        try:
-                            # Postgres supports IF NOT EXISTS
-                            conn.execute(text(f"ALTER TABLE messages ADD COLUMN IF NOT EXISTS {col_name} {col_type}"))
-                        except Exception:
-                            pass
-                    conn.commit()
-            except Exception as mig_err:
-                print(f"Migration soft-fail: {mig_err}")
-            
-            # Create Default User for Vercel Demo
-            db = SessionLocal()
-            try:
-                if not db.query(User).filter(User.email == "admin@sentinel.net").first():
-                    user = User(
-                        email="admin@sentinel.net",
-                        hashed_password=security.get_password_hash("admin"),
-                        full_name="Commander Shepard",
-                        role="admin",
-                        is_active=True
-                    )
-                    db.add(user)
-                    db.commit()
-            except Exception as e:
-                print(f"Error creating default user: {e}")
-            finally:
-                db.close()
-                
+            version = migrations.current_version(engine)
+            if version < migrations.HEAD:
+                if settings.AUTO_MIGRATE:
+                    for m in migrations.upgrade(engine):
+                        print(f"Applied migration {m.version:03d}: {m.description}")
+                else:
+                    schema_error = (f"Schema version {version} is behind head {migrations.HEAD}; "
+                                    f"run `python migrate.py` before starting the API")
+
         except Exception as db_exc:
             print(f"CRITICAL DATABASE ERROR: {db_exc}")
             # Do NOT raise, so the app still starts and we can see /health
@@ -91,8 +65,19 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Startup Error - General: {e}")
 
+    # Unlike a connection failure, a stale schema would fail requests one by one: refuse to start
+    if schema_error:
+        raise RuntimeError(schema_error)
+
+    ttl_reaper.start()
+    archive_scheduler.start()
     yield
-    # Shutdown logic (if any)
+    # Shutdown logic
+    scan_executor.shutdown()
+    await message_writer.stop()
+    await ttl_reaper.stop()
+    await archive_scheduler.stop()
+    await dashboard_hub.stop()
 
 
 app = FastAPI(title="SentinelNet API", version="1.0.0", lifespan=lifespan)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
+from app.db.base import Base
+
+class DMChannel(Base):
+    """
+    Materialized DM membership: one row per (user, dm channel), so /chat/dms is a
+    single indexed join instead of DISTINCT scans over messages.
+    """
+    __tablename__ = "dm_channels"
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(String, nullable=False)        # "dm_{min_id}_{max_id}"
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    peer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_message_at = Column(DateTime, nullable=True)  # None until the first message
+    unread_count = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "channel_id", name="uq_dm_channels_user_channel"),
+        # Per-message counter updates touch both members of a channel
+        Index("ix_dm_channels_channel_id", "channel_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
@@ -22,7 +22,7 @@ class Message(Base):
     file_type = Column(String, nullable=True)    # e.g., "image/png", "application/pdf"
     file_size = Column(String, nullable=True)    # Human readable size
     integrity_hash = Column(String, nullable=True) # SHA-256 hash of decrypted content
-    channel_id = Column(String, index=True, default="general")
+    channel_id = Column(String, default="general")  # lookups use ix_messages_channel_id_id
     expiration = Column(DateTime, nullable=True)   # Self-destruct time
     receiver_id = Column(Integer, nullable=True)  # Future: add ForeignKey("users.id") with migration
     reply_to_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
@@ -30,3 +30,26 @@ class Message(Base):
 
     sender = relationship("User")
     reply_to = relationship("Message", remote_side=[id])
+
+    # Indexes shaped after the hot queries (see check_query_plans.py).
+    # Partial indexes use the same WHERE on SQLite and Postgres.
+    __table_args__ = (
+        # /chat/messages keyset pages: channel_id = ? AND id < / > ? ORDER BY id
+        Index("ix_messages_channel_id_id", "channel_id", "id"),
+        # /threat-intel/scan dedup: sender_id + integrity_hash within the last seconds
+        Index("ix_messages_dedup", "sender_id", "integrity_hash", "timestamp",
+              sqlite_where=text("integrity_hash IS NOT NULL"),
+              postgresql_where=text("integrity_hash IS NOT NULL")),
+        # Dashboard DEFCON count and alert feed: HIGH risk ordered by time
+        Index("ix_messages_high_risk_timestamp", "timestamp",
+              sqlite_where=text("opsec_risk = 'HIGH'"),
+              postgresql_where=text("opsec_risk = 'HIGH'")),
+        # TTL reaper: expiration <= now ORDER BY expiration, only self-destructing rows
+        Index("ix_messages_expiration", "expiration",
+              sqlite_where=text("expiration IS NOT NULL"),
+              postgresql_where=text("expiration IS NOT NULL")),
+        # TTL reaper: detach replies before deleting their parent
+        Index("ix_messages_reply_to_id", "reply_to_id",
+              sqlite_where=text("reply_to_id IS NOT NULL"),
+              postgresql_where=text("reply_to_id IS NOT NULL")),
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, Integer, String, UniqueConstraint
+from app.db.base import Base
+
+# Finest bucket kept in message_rollups; coarser resolutions are summed from it
+ROLLUP_BUCKET_SECONDS = 300
+
+class MessageRollup(Base):
+    """
+    Message counts per 5-minute bucket, channel and risk pair (historical dashboard).
+    """
+    __tablename__ = "message_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_epoch = Column(BigInteger, nullable=False)  # Bucket start, seconds since 1970 (UTC)
+    channel_id = Column(String, nullable=False)
+    opsec_risk = Column(String, nullable=False)
+    phishing_risk = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Leading bucket_epoch also serves the window range scans
+        UniqueConstraint("bucket_epoch", "channel_id", "opsec_risk", "phishing_risk", name="uq_message_rollups_bucket"),
+    )
+
+class RollupState(Base):
+    """
+    Watermark: messages with id <= last_message_id are already in message_rollups.
+    """
+    __tablename__ = "rollup_state"
+
+    name = Column(String, primary_key=True)
+    last_message_id = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,309 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.message import Message
+from app.services.message_events import message_event
+from app.services.rollups import fold_deleted
+
+try:
+    import zstandard
+except ImportError:  # gzip segments when the optional zstd binding is missing
+    zstandard = None
+
+# Stored next to the viewer-independent event; stripped again on read
+ARCHIVE_ONLY_FIELDS = ("receiver_id", "expiration")
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(name: str, data: bytes) -> bytes:
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Segment {name} needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class MessageArchive:
+    """
+    Append-only cold storage for old messages, one directory per channel.
+
+    Each segment is a compressed NDJSON file of message events sorted by id;
+    `index.json` lists the segments with their id and time ranges, so a page
+    read only decompresses the segments its cursor range overlaps. Archived ids
+    of a channel are always below its hot ids (archiving moves an id prefix),
+    which is what lets /chat/messages continue into the archive seamlessly.
+    """
+
+    def __init__(self, root: str, segment_rows: int = 5000, cache_segments: int = 32):
+        self.root = root
+        self.segment_rows = max(1, segment_rows)
+        # channel -> (index.json mtime, segments); re-read when another process appends
+        self._indexes: Dict[str, tuple] = {}
+        self._segments = TTLCache(cache_segments, ttl_seconds=600)
+        self._lock = threading.Lock()
+
+    def _channel_dir(self, channel_id: str) -> str:
+        # Channel ids are user supplied; keep them inside the archive root and unique
+        safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in channel_id)
+        if safe != channel_id or not safe:
+            safe = f"{safe[:64]}~{hashlib.sha1(channel_id.encode()).hexdigest()[:12]}"
+        return os.path.join(self.root, safe)
+
+    def segments(self, channel_id: str) -> List[dict]:
+        path = os.path.join(self._channel_dir(channel_id), "index.json")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        cached = self._indexes.get(channel_id)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                cached = (mtime, json.load(f)["segments"])
+            self._indexes[channel_id] = cached
+        return cached[1]
+
+    def last_id(self, channel_id: str) -> int:
+        segments = self.segments(channel_id)
+        return segments[-1]["last_id"] if segments else 0
+
+    def append(self, channel_id: str, records: List[dict]) -> dict:
+        """
+        Write one segment (records sorted by id, all above last_id) and publish it in
+        the index. The segment is durable before the index names it.
+        """
+        with self._lock:
+            directory = self._channel_dir(channel_id)
+            os.makedirs(directory, exist_ok=True)
+            first, last = records[0], records[-1]
+            suffix = ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+            name = f"{first['id']:012d}-{last['id']:012d}{suffix}"
+            payload = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode()
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(_compress(payload))
+                f.flush()
+                os.fsync(f.fileno())
+
+            segment = {
+                "file": name,
+                "first_id": first["id"],
+                "last_id": last["id"],
+                "first_ts": first["timestamp"],
+                "last_ts": last["timestamp"],
+                "count": len(records),
+            }
+            segments = self.segments(channel_id) + [segment]
+            tmp = os.path.join(directory, "index.json.tmp")
+            with open(tmp, "w") as f:
+                json.dump({"channel_id": channel_id, "segments": segments}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, os.path.join(directory, "index.json"))
+            return segment
+
+    def _load(self, channel_id: str, segment: dict) -> List[dict]:
+        key = (channel_id, segment["file"])
+        records = self._segments.get(key)
+        if records is None:
+            with open(os.path.join(self._channel_dir(channel_id), segment["file"]), "rb") as f:
+                data = _decompress(segment["file"], f.read())
+            records = [json.loads(line) for line in data.splitlines() if line]
+            self._segments.set(key, records)
+        return records
+
+    def read(self, channel_id: str, limit: int, before_id: Optional[int] = None,
+             after_id: Optional[int] = None) -> List[dict]:
+        """
+        Up to `limit` archived events, oldest first: the newest ones below
+        `before_id`, or the oldest ones above `after_id`.
+        """
+        segments = self.segments(channel_id)
+        if not segments or limit <= 0:
+            return []
+        out: List[dict] = []
+        if after_id is not None:
+            for segment in segments:
+                if segment["last_id"] <= after_id:
+                    continue
+                out.extend(r for r in self._load(channel_id, segment) if r["id"] > after_id)
+                if len(out) >= limit:
+                    break
+            return out[:limit]
+
+        for segment in reversed(segments):
+            if before_id is not None and segment["first_id"] >= before_id:
+                continue
+            records = [r for r in self._load(channel_id, segment) if before_id is None or r["id"] < before_id]
+            out = records + out
+            if len(out) >= limit:
+                break
+        return out[-limit:]
+
+    def stats(self) -> dict:
+        channels = [d for d in os.listdir(self.root)] if os.path.isdir(self.root) else []
+        return {"root": self.root, "channels": len(channels), **self._segments.stats()}
+
+
+def archived_event(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k not in ARCHIVE_ONLY_FIELDS}
+
+
+def archive_cutoffs(now: datetime) -> Dict[Optional[str], Optional[datetime]]:
+    """
+    Age limit per channel; the None key is the default for unlisted channels.
+    A non-positive age disables archiving (cutoff None).
+    """
+    ages = {None: settings.ARCHIVE_AFTER_DAYS, **settings.ARCHIVE_CHANNEL_DAYS}
+    return {channel_id: now - timedelta(days=days) if days > 0 else None for channel_id, days in ages.items()}
+
+
+def archive_messages(db: Session, archive: MessageArchive, now: Optional[datetime] = None) -> dict:
+    """
+    Move every channel's messages older than its cutoff into segments and delete
+    them from the hot table, one committed segment at a time.
+    """
+    now = now or datetime.utcnow()
+    cutoffs = archive_cutoffs(now)
+    moved: Dict[str, int] = {}
+    active = [c for c in cutoffs.values() if c is not None]
+    if not active:
+        return moved
+
+    candidates = db.execute(
+        select(Message.channel_id).where(Message.timestamp < max(active)).group_by(Message.channel_id)
+    ).scalars().all()
+
+    for channel_id in candidates:
+        cutoff = cutoffs[channel_id] if channel_id in cutoffs else cutoffs[None]
+        if cutoff is None:
+            continue
+        last_id = archive.last_id(channel_id)
+        if last_id:
+            # A crash between writing a segment and deleting its rows leaves them in both places
+            _delete_archived(db, channel_id, last_id)
+
+        # Archive an id prefix: everything below the first message that is still young
+        boundary = db.execute(
+            select(func.min(Message.id)).where(Message.channel_id == channel_id, Message.timestamp >= cutoff)
+        ).scalar()
+        while True:
+            query = (
+                select(Message).options(joinedload(Message.reply_to))
+                .where(Message.channel_id == channel_id, Message.id > last_id)
+                .order_by(Message.id).limit(archive.segment_rows)
+            )
+            if boundary is not None:
+                query = query.where(Message.id < boundary)
+            rows = db.execute(query).scalars().all()
+            if not rows:
+                break
+            records = [
+                jsonable_encoder({**message_event(m), "receiver_id": m.receiver_id, "expiration": m.expiration})
+                for m in rows
+            ]
+            archive.append(channel_id, records)
+            last_id = rows[-1].id
+            _delete_archived(db, channel_id, last_id)
+            moved[channel_id] = moved.get(channel_id, 0) + len(rows)
+            db.expunge_all()
+    return moved
+
+
+def _delete_archived(db: Session, channel_id: str, last_id: int) -> None:
+    archived = select(Message.id).where(Message.channel_id == channel_id, Message.id <= last_id)
+    fold_deleted(db, Message.channel_id == channel_id, Message.id <= last_id)
+    # Hot replies keep their row and lose the reference (foreign key on Postgres)
+    db.execute(update(Message).where(Message.reply_to_id.in_(archived)).values(reply_to_id=None)
+               .execution_options(synchronize_session=False))
+    db.execute(Message.__table__.delete().where(Message.channel_id == channel_id, Message.id <= last_id))
+    db.commit()
+
+
+class ArchiveScheduler:
+    """
+    Runs archive_messages every `interval_seconds` in a worker thread (file I/O and
+    compression stay off the event loop). Disabled when no channel has an age limit.
+    """
+
+    def __init__(self, session_factory, archive: MessageArchive, interval_seconds: float):
+        self.session_factory = session_factory
+        self.archive = archive
+        self.interval_seconds = interval_seconds
+        self.runs = 0
+        self.rows_archived = 0
+        self.errors = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_ms = 0.0
+        self.last_run_rows: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0 and any(archive_cutoffs(datetime.utcnow()).values())
+
+    def run_once(self) -> Dict[str, int]:
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            moved = archive_messages(db, self.archive)
+        finally:
+            db.close()
+        self.runs += 1
+        self.rows_archived += sum(moved.values())
+        self.last_run_at = datetime.utcnow()
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.last_run_rows = moved
+        return moved
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                self.errors += 1
+                print(f"Message archival failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "rows_archived": self.rows_archived,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_run_ms": self.last_run_ms,
+            "last_run_rows": self.last_run_rows,
+            "segment_cache": self.archive.stats(),
+        }
+
+
+message_archive = MessageArchive(settings.ARCHIVE_DIR, segment_rows=settings.ARCHIVE_SEGMENT_ROWS)
+archive_scheduler = ArchiveScheduler(SessionLocal, message_archive, settings.ARCHIVE_INTERVAL_SECONDS)
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Dict, Iterable, Set
+
+from fastapi.encoders import jsonable_encoder
+
+
+class Subscription:
+    """
+    One WebSocket connection: the viewing user, its channels and an outbound queue.
+    """
+
+    def __init__(self, user_id: int, max_pending: int = 256):
+        self.user_id = user_id
+        self.channels: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+
+class ChatBroker:
+    """
+    In-process pub/sub fan-out of newly committed chat messages.
+
+    Each uvicorn worker has its own broker, so a client only receives messages
+    committed by the worker it is connected to.
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, sub: Subscription, channel_ids: Iterable[str]) -> None:
+        for channel_id in channel_ids:
+            sub.channels.add(channel_id)
+            self._channels.setdefault(channel_id, set()).add(sub)
+
+    def unsubscribe(self, sub: Subscription, channel_ids: Iterable[str] = None) -> None:
+        for channel_id in list(channel_ids if channel_ids is not None else sub.channels):
+            sub.channels.discard(channel_id)
+            subscribers = self._channels.get(channel_id)
+            if subscribers is not None:
+                subscribers.discard(sub)
+                if not subscribers:
+                    del self._channels[channel_id]
+
+    def subscriber_count(self, channel_id: str) -> int:
+        return len(self._channels.get(channel_id, ()))
+
+    def publish(self, channel_id: str, payload: dict) -> None:
+        """
+        Queue a serialized message (with "sender_id") for every subscriber of the channel.
+        Slow consumers whose queue is full are flagged and dropped by their connection.
+        """
+        subscribers = self._channels.get(channel_id)
+        if not subscribers:
+            return
+        payload = jsonable_encoder(payload)
+        for sub in list(subscribers):
+            try:
+                sub.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                sub.overflowed = True
+
+
+chat_broker = ChatBroker()
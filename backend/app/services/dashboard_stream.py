@@ -0,0 +1,121 @@
+import asyncio
+import json
+from difflib import SequenceMatcher
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+
+
+class DashboardHub:
+    """
+    Shares one dashboard snapshot per tick between every connected SSE client.
+
+    A single background task awaits `compute` once per tick while at least one
+    client is connected, diffs it against the previous snapshot and fans out
+    only what changed. DB load therefore scales with the tick rate, not with
+    the number of open dashboards.
+
+    An "update" event is {"set": {field: value}, "splice": {field: patch}}.
+    Changed lists are spliced rather than resent: the new list is
+    patch["head"] + old[patch["start"]:patch["end"]] + patch["tail"], keeping
+    the longest run of items that did not change (a sliding trend window or
+    prepended log lines cost only the new items).
+    """
+
+    def __init__(self, compute: Callable[[], Awaitable[dict]], tick_seconds: float = 3.0, max_pending: int = 16):
+        self.compute = compute
+        self.tick_seconds = tick_seconds
+        self.max_pending = max_pending
+        self.latest: Optional[dict] = None
+        self._clients: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    async def connect(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        if self.latest is None:
+            self.latest = await self._snapshot()
+        queue.put_nowait(("snapshot", self.latest))
+        self._clients.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def disconnect(self, queue: asyncio.Queue) -> None:
+        self._clients.discard(queue)
+
+    async def _snapshot(self) -> dict:
+        return jsonable_encoder(await self.compute())
+
+    async def _run(self) -> None:
+        while self._clients:
+            await asyncio.sleep(self.tick_seconds)
+            if not self._clients:
+                break
+            try:
+                snapshot = await self._snapshot()
+            except Exception as e:
+                print(f"Dashboard snapshot failed: {e}")
+                continue
+            previous, self.latest = self.latest or {}, snapshot
+            changed = diff_snapshots(previous, snapshot)
+            if changed["set"] or changed["splice"]:
+                self._broadcast(changed)
+        # Drop the cached snapshot so the next viewer does not start from stale data
+        self.latest = None
+
+    def _broadcast(self, changed: dict) -> None:
+        for queue in list(self._clients):
+            try:
+                queue.put_nowait(("update", changed))
+            except asyncio.QueueFull:
+                # Client lagged: replace its backlog with one full snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", self.latest))
+
+    async def stop(self) -> None:
+        self._clients.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def splice_patch(old: list, new: list) -> Optional[dict]:
+    """
+    {"head", "start", "end", "tail"} rebuilding `new` around the longest run of
+    items shared with `old`, or None when nothing is shared.
+    """
+    old_keys = [json.dumps(item, sort_keys=True) for item in old]
+    new_keys = [json.dumps(item, sort_keys=True) for item in new]
+    match = SequenceMatcher(None, old_keys, new_keys, autojunk=False).find_longest_match(
+        0, len(old_keys), 0, len(new_keys))
+    if match.size == 0:
+        return None
+    return {
+        "head": new[:match.b],
+        "start": match.a,
+        "end": match.a + match.size,
+        "tail": new[match.b + match.size:],
+    }
+
+
+def diff_snapshots(previous: dict, snapshot: dict) -> Dict[str, dict]:
+    changed: Dict[str, dict] = {"set": {}, "splice": {}}
+    for key, value in snapshot.items():
+        before = previous.get(key)
+        if before == value:
+            continue
+        patch = splice_patch(before, value) if isinstance(before, list) and isinstance(value, list) else None
+        if patch is not None:
+            changed["splice"][key] = patch
+        else:
+            changed["set"][key] = value
+    return changed
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
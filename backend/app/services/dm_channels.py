@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import case, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.dm_channel import DMChannel
+from app.models.user import User
+
+
+def parse_dm_channel(channel_id: str) -> Optional[Tuple[int, int]]:
+    # "dm_{min_id}_{max_id}" -> (min_id, max_id)
+    parts = channel_id.split("_")
+    if len(parts) != 3 or parts[0] != "dm":
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+def ensure_dm_members(db: Session, channel_id: str, u1: int, u2: int) -> None:
+    """
+    Insert both membership rows if missing (INSERT ... ON CONFLICT DO NOTHING).
+    """
+    rows = [
+        {"channel_id": channel_id, "user_id": u1, "peer_id": u2, "unread_count": 0},
+        {"channel_id": channel_id, "user_id": u2, "peer_id": u1, "unread_count": 0},
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(DMChannel).values(rows).on_conflict_do_nothing(
+            index_elements=["user_id", "channel_id"])
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(DMChannel).values(rows).on_conflict_do_nothing(
+            index_elements=["user_id", "channel_id"])
+    else:
+        existing = {r.user_id for r in db.query(DMChannel.user_id).filter(DMChannel.channel_id == channel_id)}
+        db.add_all([DMChannel(**row) for row in rows if row["user_id"] not in existing])
+        return
+    db.execute(stmt)
+
+
+def record_dm_message(db: Session, channel_id: str, sender_id: int, timestamp: datetime) -> None:
+    """
+    Bump last activity for both members and the receiver's unread counter.
+    Runs in the caller's transaction, next to the message insert.
+    """
+    members = parse_dm_channel(channel_id)
+    if members is None or sender_id not in members:
+        return
+
+    stmt = (
+        update(DMChannel)
+        .where(DMChannel.channel_id == channel_id)
+        .values(
+            last_message_at=timestamp,
+            # Sending implies the sender has read the conversation
+            unread_count=case((DMChannel.user_id == sender_id, 0), else_=DMChannel.unread_count + 1),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(stmt).rowcount < 2:
+        # First message in a channel nobody opened with /chat/dm.
+        # Skip channels naming a non-existent user (foreign keys would reject them)
+        if db.query(User.id).filter(User.id.in_(members)).count() < 2:
+            return
+        ensure_dm_members(db, channel_id, *members)
+        db.execute(stmt)
+
+
+def mark_dm_read(db: Session, channel_id: str, user_id: int) -> bool:
+    """
+    Reset the user's unread counter. Reads first so idle polls never take a write lock.
+    Returns True if a write is pending (caller commits).
+    """
+    unread = db.query(DMChannel.unread_count).filter(
+        DMChannel.user_id == user_id, DMChannel.channel_id == channel_id).scalar()
+    if not unread:
+        return False
+    db.execute(
+        update(DMChannel)
+        .where(DMChannel.user_id == user_id, DMChannel.channel_id == channel_id, DMChannel.unread_count > 0)
+        .values(unread_count=0)
+        .execution_options(synchronize_session=False)
+    )
+    return True
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class IdempotencyIndex:
+    """
+    Recent (sender_id, key) -> response, so a repeated submit gets the first
+    result back without scanning or touching the database.
+
+    Entries are filed into time buckets of `bucket_seconds` by when they were
+    stored; once a bucket is older than `window_seconds` it is dropped whole, so
+    expiry costs one dict pop per bucket instead of a timer or a scan per entry.
+    A request that is still being processed is tracked as in flight: an
+    identical request arriving meanwhile waits for its result instead of
+    racing it into a second insert. Callers look up every key before they
+    claim any (claim() is one synchronous step), so a request never waits
+    while holding claims of its own and overlapping batches cannot deadlock;
+    a key another request claimed in between is left to the database check.
+
+    The index only knows what this process stored. Until one window has passed
+    since startup (`warm`), callers fall back to the database for keys it has.
+    """
+
+    def __init__(self, window_seconds: float, max_entries: int = 100000, bucket_seconds: Optional[float] = None,
+                 wait_seconds: float = 30.0):
+        self.window_seconds = window_seconds
+        self.wait_seconds = wait_seconds
+        self.max_entries = max(1, max_entries)
+        self.bucket_seconds = bucket_seconds or max(window_seconds / 10, 0.1)
+        self._entries: Dict[Tuple[int, Hashable], Tuple[int, Any]] = {}
+        # bucket number -> keys stored in it; ascending because time only moves forward
+        self._buckets: "OrderedDict[int, List[Tuple[int, Hashable]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.evictions = 0
+        self.timeouts = 0
+
+    @property
+    def warm(self) -> bool:
+        return time.monotonic() - self.started_at >= self.window_seconds
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _expire(self, now: float) -> None:
+        # A bucket is dropped once even its newest entry is older than the window
+        oldest_live = self._bucket(now - self.window_seconds)
+        while self._buckets:
+            bucket = next(iter(self._buckets))
+            if bucket >= oldest_live and len(self._entries) <= self.max_entries:
+                break
+            expired = bucket < oldest_live
+            for key in self._buckets.pop(bucket):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == bucket:
+                    del self._entries[key]
+                    if not expired:
+                        self.evictions += 1
+
+    def _stored(self, key: Tuple[int, Hashable], now: float) -> Any:
+        # Caller holds _lock
+        self._expire(now)
+        entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def get(self, sender_id: int, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            value = self._stored((sender_id, key), now)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def lookup(self, sender_id: int, key: Hashable) -> Any:
+        """
+        Stored response for the key, waiting (at most wait_seconds) for an
+        identical request still in flight. None when the caller should process
+        the request itself. Never call it while holding claims.
+        """
+        pending = self._inflight.get((sender_id, key))
+        if pending is not None:
+            self.joined += 1
+            try:
+                # shield: a cancelled or timed-out duplicate must not cancel the original request
+                return await asyncio.wait_for(asyncio.shield(pending), self.wait_seconds)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return None
+        return self.get(sender_id, key)
+
+    def claim(self, sender_id: int, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+        """
+        Mark the keys in flight in one step, without awaiting. Returns the
+        responses stored since the lookup and the keys claimed; pair each claim
+        with complete() or abort(). Keys in neither are in flight elsewhere.
+        """
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        stored, claimed = {}, []
+        with self._lock:
+            for key in keys:
+                value = self._stored((sender_id, key), now)
+                if value is not None:
+                    stored[key] = value
+                elif (sender_id, key) not in self._inflight:
+                    self._inflight[(sender_id, key)] = loop.create_future()
+                    claimed.append(key)
+        return stored, claimed
+
+    def complete(self, sender_id: int, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        bucket = self._bucket(now)
+        with self._lock:
+            self._entries[(sender_id, key)] = (bucket, value)
+            self._buckets.setdefault(bucket, []).append((sender_id, key))
+            self._expire(now)
+        pending = self._inflight.pop((sender_id, key), None)
+        if pending is not None and not pending.done():
+            pending.set_result(value)
+
+    def abort(self, sender_id: int, key: Hashable) -> None:
+        # Waiting duplicates get None and process the request themselves
+        pending = self._inflight.pop((sender_id, key), None)
+        if pending is not None and not pending.done():
+            pending.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_entries,
+            "window_seconds": self.window_seconds,
+            "buckets": len(self._buckets),
+            "in_flight": len(self._inflight),
+            "warm": self.warm,
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "wait_timeouts": self.timeouts,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Client double-submits: same sender + integrity_hash within a few seconds
+recent_hashes = IdempotencyIndex(settings.DEDUP_WINDOW_SECONDS, settings.IDEMPOTENCY_MAX_ENTRIES,
+                                 wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS)
+# Retries carrying the same Idempotency-Key header
+idempotency_keys = IdempotencyIndex(settings.IDEMPOTENCY_KEY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_ENTRIES,
+                                    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS)
@@ -0,0 +1,71 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed, categorised keyword set.
+
+    Built once at startup; `scan` then walks the text a single time and reports
+    every keyword that occurs anywhere in it (substring semantics, same as
+    `phrase in text`), grouped by category. Cost is linear in the text length
+    plus the number of hits, independent of how many keywords are loaded.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories = {name: tuple(words) for name, words in categories.items()}
+
+        # Trie as parallel arrays: goto transitions, failure links, outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+
+        for category, words in self.categories.items():
+            for word in words:
+                self._insert(word.lower(), category)
+        self._build_failure_links()
+
+    def _insert(self, word: str, category: str) -> None:
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append((category, word))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit outputs of the longest proper suffix so a single
+                # state visit reports every keyword ending at this position
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def scan(self, text_lower: str) -> Dict[str, Set[str]]:
+        """
+        Return {category: {matched keywords}} for an already-lowercased text.
+        Every category is present in the result, empty if nothing matched.
+        """
+        hits: Dict[str, Set[str]] = {name: set() for name in self.categories}
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text_lower:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for category, word in out[node]:
+                    hits[category].add(word)
+        return hits
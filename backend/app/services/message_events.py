@@ -0,0 +1,59 @@
+from app.models.message import Message
+
+# Message payloads shared by the REST endpoints, the WebSocket push and the archive.
+
+
+def message_event(msg: Message) -> dict:
+    """
+    Viewer-independent representation of a message; `for_viewer` turns the
+    sender ids into the "me"/"them" form the client renders.
+    """
+    # Determine status
+    status = "blocked" if msg.is_blocked else "sent"
+    
+    # Build risk object - always include threat analysis data
+    risk = {
+        "ai_score": msg.ai_score if msg.ai_score is not None else 0.0,
+        "opsec_risk": msg.opsec_risk if msg.opsec_risk else "SAFE",
+        "phishing_risk": msg.phishing_risk if msg.phishing_risk else "LOW",
+        "explanation": "Analysis complete"
+    }
+
+    reply_to_data = None
+    if msg.reply_to:
+        reply_to_data = {
+            "id": msg.reply_to.id,
+            "text": msg.reply_to.content_encrypted,
+            "sender_id": msg.reply_to.sender_id
+        }
+
+    return {
+        "id": msg.id,
+        "channel_id": msg.channel_id,
+        "text": msg.content_encrypted, # In real app, decrypt here or on client
+        "sender_id": msg.sender_id,
+        "timestamp": msg.timestamp,
+        "status": status,
+        "risk": risk,
+        "file_url": msg.file_url,
+        "file_type": msg.file_type,
+        "file_size": msg.file_size,
+        "integrity_hash": msg.integrity_hash,
+        "reply_to": reply_to_data,
+        "is_deleted": msg.is_deleted
+    }
+
+# The client renders a reply's parent as a one-line preview
+REPLY_PREVIEW_CHARS = 160
+
+def for_viewer(event: dict, viewer_id: int) -> dict:
+    data = {k: v for k, v in event.items() if k not in ("sender_id", "channel_id")}
+    data["sender"] = "me" if event["sender_id"] == viewer_id else "them"
+    if event["reply_to"]:
+        reply = event["reply_to"]
+        data["reply_to"] = {
+            "id": reply["id"],
+            "text": reply["text"][:REPLY_PREVIEW_CHARS] if reply["text"] else reply["text"],
+            "sender": "me" if reply["sender_id"] == viewer_id else "them"
+        }
+    return data
@@ -0,0 +1,203 @@
+import asyncio
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.models.message import Message
+
+# Runs in the insert transaction after the flush (ids and timestamps assigned), via run_sync
+AfterFlush = Callable[[Session], Any]
+
+
+class _Job:
+    __slots__ = ("rows", "after", "future")
+
+    def __init__(self, rows: Sequence[Message], after: Optional[AfterFlush], future: asyncio.Future):
+        self.rows = rows
+        self.after = after
+        self.future = future
+
+
+class MessageWriter:
+    """
+    Serializes message inserts through one background task, optionally
+    committing several callers' inserts together (group commit).
+
+    SQLite allows a single writer at a time; concurrent request sessions racing
+    for the write lock spin on busy_timeout and surface "database is locked".
+    Queued jobs instead commit one after another, each batch on a fresh writer
+    session, while readers (WAL) keep using their request sessions. If the
+    worker stops or dies, every job it still holds fails instead of hanging.
+
+    With group commit, the writer collects jobs until `max_rows` rows are queued
+    or `max_delay_ms` has passed since the first one, then inserts them with one
+    flush and one COMMIT, so one fsync / round trip covers the whole batch. Callers
+    only resume once their batch is committed, so durability is unchanged.
+
+    When disabled (Postgres without group commit) jobs run inline on the caller's
+    session.
+    """
+
+    def __init__(self, session_factory, enabled: bool, max_rows: int = 1,
+                 max_delay_ms: float = 0.0, max_pending: int = 1024):
+        self.session_factory = session_factory
+        self.enabled = enabled and session_factory is not None
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self.max_pending = max_pending
+        self.jobs_run = 0
+        self.batches = 0
+        self.rows_written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def insert(self, rows: Sequence[Message], db: AsyncSession, after: Optional[AfterFlush] = None) -> Any:
+        """
+        Insert `rows`, run `after(sync_session)` in the same transaction and return
+        its result once committed. Row ids are populated on return.
+        """
+        if not self.enabled:
+            db.add_all(rows)
+            await db.flush()
+            result = await db.run_sync(after) if after is not None else None
+            await db.commit()
+            return result
+        # The caller's session may still hold a pooled connection (principal lookup,
+        # duplicate check). Hand it back before waiting: enough waiting requests would
+        # otherwise drain the pool the writer's own session draws from
+        await db.commit()
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._worker(self._queue))
+        job = _Job(rows, after, asyncio.get_running_loop().create_future())
+        await self._queue.put(job)
+        return await job.future
+
+    async def _collect(self, queue: asyncio.Queue, batch: List[_Job]) -> None:
+        # Fills the worker's batch in place, so jobs taken off the queue are never lost
+        batch.append(await queue.get())
+        rows = len(batch[0].rows)
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while rows < self.max_rows:
+            if not queue.empty():
+                job = queue.get_nowait()
+            else:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(job)
+            rows += len(job.rows)
+
+    async def _commit(self, session: AsyncSession, batch: List[_Job]) -> List[Any]:
+        session.add_all([row for job in batch for row in job.rows])
+        # One flush: a single executemany INSERT for every row in the batch
+        await session.flush()
+        results = await session.run_sync(
+            lambda sync_session: [job.after(sync_session) if job.after is not None else None for job in batch])
+        await session.commit()
+        # Detach right away: a later rollback on this session would expire them.
+        # Written objects stay usable by the caller (expire_on_commit=False)
+        session.expunge_all()
+        return results
+
+    async def _write(self, batch: List[_Job]) -> List[Tuple[_Job, Any, Optional[BaseException]]]:
+        # A fresh session (and pooled connection) per batch: a connection dropped
+        # under one batch does not poison the ones after it
+        async with self.session_factory() as session:
+            try:
+                return [(job, result, None) for job, result in zip(batch, await self._commit(session, batch))]
+            except Exception as e:
+                await session.rollback()
+                if len(batch) == 1:
+                    return [(batch[0], None, e)]
+            finally:
+                session.expunge_all()
+        # One bad job must not fail its neighbours: retry each on its own
+        outcomes = []
+        for job in batch:
+            for row in job.rows:
+                row.id = None
+            async with self.session_factory() as session:
+                try:
+                    outcomes.append((job, (await self._commit(session, [job]))[0], None))
+                except Exception as job_error:
+                    await session.rollback()
+                    outcomes.append((job, None, job_error))
+                finally:
+                    session.expunge_all()
+        return outcomes
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        batch: List[_Job] = []
+        try:
+            while True:
+                batch = []
+                await self._collect(queue, batch)
+                batch = [job for job in batch if not job.future.cancelled()]
+                if not batch:
+                    continue
+                try:
+                    outcomes = await self._write(batch)
+                except Exception as e:
+                    # e.g. the rollback itself failed on a dropped connection
+                    outcomes = [(job, None, e) for job in batch]
+                self.batches += 1
+                for job, result, error in outcomes:
+                    self.jobs_run += 1
+                    if error is None:
+                        self.rows_written += len(job.rows)
+                    if job.future.done():
+                        continue
+                    if error is None:
+                        job.future.set_result(result)
+                    else:
+                        job.future.set_exception(error)
+                batch = []
+        finally:
+            # Stopped or crashed: nobody will serve this queue again (insert() starts a
+            # new worker with a new queue), so fail everything it still holds
+            error = RuntimeError("Message writer stopped before the insert was committed")
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_rows": self.max_rows,
+            "max_delay_ms": self.max_delay * 1000,
+            "jobs": self.jobs_run,
+            "batches": self.batches,
+            "rows": self.rows_written,
+            "rows_per_batch": round(self.rows_written / self.batches, 2) if self.batches else 0.0,
+        }
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            # Let the worker's cleanup fail the jobs it still holds before returning
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._queue = None
+
+
+_async_sqlite = db_session.async_engine is not None and db_session.async_engine.dialect.name == "sqlite"
+
+message_writer = MessageWriter(
+    db_session.AsyncSessionLocal,
+    enabled=settings.MESSAGE_GROUP_COMMIT or (settings.SQLITE_SINGLE_WRITER and _async_sqlite),
+    max_rows=settings.GROUP_COMMIT_MAX_ROWS if settings.MESSAGE_GROUP_COMMIT else 1,
+    max_delay_ms=settings.GROUP_COMMIT_MAX_DELAY_MS if settings.MESSAGE_GROUP_COMMIT else 0.0,
+)
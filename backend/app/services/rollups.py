@@ -0,0 +1,209 @@
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, func, literal_column, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.message import Message
+from app.models.rollup import ROLLUP_BUCKET_SECONDS, MessageRollup, RollupState
+from app.services.threat_counters import EPOCH
+
+WATERMARK = "messages"
+# Leave very recent rows to the live tail query, so transactions that commit
+# slightly out of id order are not skipped by the watermark
+ROLLUP_LAG = timedelta(minutes=1)
+MAX_POINTS = 500
+_DURATION = re.compile(r"^(\d+)([mhd])$")
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+_last_refresh = 0.0
+
+
+def parse_duration(value: str) -> int:
+    """
+    "15m" / "24h" / "7d" -> seconds. Raises ValueError on anything else.
+    """
+    match = _DURATION.match(value.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid duration '{value}' (use e.g. 15m, 24h, 7d)")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def epoch_bucket(column, seconds: int, dialect: str):
+    """
+    SQL expression flooring a naive-UTC timestamp column to `seconds` buckets, as epoch seconds.
+    """
+    # Inlined, not bound: Postgres only matches the GROUP BY expression to the
+    # selected one when both are textually identical, parameters included
+    seconds = literal_column(str(int(seconds)), Integer)
+    if dialect == "postgresql":
+        return cast(func.floor(func.extract("epoch", column) / seconds), Integer) * seconds
+    # SQLite: strftime('%s') yields integer epoch seconds; integer division floors
+    return (cast(func.strftime("%s", column), Integer) // seconds) * seconds
+
+
+def _watermark(db: Session) -> int:
+    return db.query(RollupState.last_message_id).filter(RollupState.name == WATERMARK).scalar() or 0
+
+
+def _ensure_state(db: Session) -> None:
+    # The watermark row has to exist before it can be compared-and-set or locked
+    if db.get(RollupState, WATERMARK) is None:
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        db.execute(insert(RollupState).values(name=WATERMARK, last_message_id=0).on_conflict_do_nothing())
+        db.commit()
+
+
+def _fold(db: Session, *criteria) -> None:
+    # INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE of the messages matching criteria
+    dialect = db.get_bind().dialect.name
+    bucket = epoch_bucket(Message.timestamp, ROLLUP_BUCKET_SECONDS, dialect).label("bucket_epoch")
+    channel = func.coalesce(Message.channel_id, literal_column("'general'")).label("channel_id")
+    opsec = func.coalesce(Message.opsec_risk, literal_column("'SAFE'")).label("opsec_risk")
+    phishing = func.coalesce(Message.phishing_risk, literal_column("'LOW'")).label("phishing_risk")
+    grouped = (
+        select(bucket, channel, opsec, phishing, func.count().label("count"))
+        .where(*criteria)
+        .group_by(bucket, channel, opsec, phishing)
+    )
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(MessageRollup).from_select(
+        ["bucket_epoch", "channel_id", "opsec_risk", "phishing_risk", "count"], grouped)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket_epoch", "channel_id", "opsec_risk", "phishing_risk"],
+        set_={"count": MessageRollup.count + stmt.excluded["count"]},
+    )
+    db.execute(stmt)
+
+
+def refresh_rollups(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Fold messages past the watermark into message_rollups. Returns the new watermark.
+
+    The range is claimed with a compare-and-set on the watermark row, so of
+    concurrent refreshes (other workers, other threadpool requests) exactly one
+    folds it; the others change no row and skip the insert.
+    """
+    global _last_refresh
+    now = now or datetime.utcnow()
+    _ensure_state(db)
+    watermark = _watermark(db)
+    upper = db.query(func.max(Message.id)).filter(
+        Message.id > watermark, Message.timestamp < now - ROLLUP_LAG).scalar()
+    _last_refresh = time.monotonic()
+    if upper is None:
+        return watermark
+
+    try:
+        claimed = db.execute(
+            update(RollupState)
+            .where(RollupState.name == WATERMARK, RollupState.last_message_id == watermark)
+            .values(last_message_id=upper)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed:
+            _fold(db, Message.id > watermark, Message.id <= upper)
+        db.commit()
+    except OperationalError:
+        # SQLite: a concurrent refresh committed after this snapshot was read; it owns the range
+        db.rollback()
+        if db.get_bind().dialect.name != "sqlite":
+            raise
+        claimed = 0
+    return upper if claimed else _watermark(db)
+
+
+def fold_deleted(db: Session, *criteria) -> None:
+    """
+    Count the messages matching criteria that the watermark has not passed yet
+    into message_rollups, so history keeps rows the TTL reaper or the archiver
+    is about to delete. Call inside the deleting transaction: the watermark row
+    stays locked until it commits, so no refresh can fold the same rows again.
+    """
+    _ensure_state(db)
+    # No-op UPDATE: takes the row lock and reads the watermark in one statement
+    watermark = db.execute(
+        update(RollupState)
+        .where(RollupState.name == WATERMARK)
+        .values(last_message_id=RollupState.last_message_id)
+        .returning(RollupState.last_message_id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    _fold(db, Message.id > watermark, *criteria)
+
+
+def refresh_if_stale(db: Session, max_age_seconds: float) -> None:
+    if time.monotonic() - _last_refresh >= max_age_seconds:
+        refresh_rollups(db)
+
+
+def threat_series(db: Session, window_seconds: int, resolution_seconds: int,
+                  now: Optional[datetime] = None, channel_id: Optional[str] = None) -> List[dict]:
+    """
+    Trend over an arbitrary window: rolled-up buckets up to the watermark plus a
+    SQL GROUP BY over the not-yet-rolled tail. Nothing is loaded row by row.
+    Each point has the bucket start, non-SAFE ("value") and total message counts.
+    """
+    if resolution_seconds % ROLLUP_BUCKET_SECONDS:
+        raise ValueError(f"Resolution must be a multiple of {ROLLUP_BUCKET_SECONDS // 60}m")
+    if window_seconds // resolution_seconds > MAX_POINTS:
+        raise ValueError(f"Window/resolution yields more than {MAX_POINTS} points")
+
+    dialect = db.get_bind().dialect.name
+    now = now or datetime.utcnow()
+    end = int((now - EPOCH).total_seconds())
+    start = (end - window_seconds) // resolution_seconds * resolution_seconds
+    totals: Dict[int, List[int]] = {}
+
+    def add(rows):
+        for bucket_start, threats, total in rows:
+            point = totals.setdefault(int(bucket_start), [0, 0])
+            point[0] += int(threats or 0)
+            point[1] += int(total or 0)
+
+    watermark = _watermark(db)
+
+    # 1. Rolled-up history, re-bucketed to the requested resolution
+    step = literal_column(str(int(resolution_seconds)), Integer)  # inlined, see epoch_bucket
+    rolled_bucket = (MessageRollup.bucket_epoch // step) * step
+    query = (
+        select(
+            rolled_bucket,
+            func.sum(case((MessageRollup.opsec_risk != "SAFE", MessageRollup.count), else_=0)),
+            func.sum(MessageRollup.count),
+        )
+        .where(MessageRollup.bucket_epoch >= start)
+        .group_by(rolled_bucket)
+    )
+    if channel_id:
+        query = query.where(MessageRollup.channel_id == channel_id)
+    add(db.execute(query).all())
+
+    # 2. Tail past the watermark, bucketed in SQL
+    raw_bucket = epoch_bucket(Message.timestamp, resolution_seconds, dialect)
+    query = (
+        select(
+            raw_bucket,
+            func.sum(case((func.coalesce(Message.opsec_risk, "SAFE") != "SAFE", 1), else_=0)),
+            func.count(),
+        )
+        .where(Message.id > watermark, Message.timestamp >= EPOCH + timedelta(seconds=start))
+        .group_by(raw_bucket)
+    )
+    if channel_id:
+        query = query.where(Message.channel_id == channel_id)
+    add(db.execute(query).all())
+
+    series = []
+    for bucket_start in range(start, end + 1, resolution_seconds):
+        threats, total = totals.get(bucket_start, (0, 0))
+        series.append({
+            "time": EPOCH + timedelta(seconds=bucket_start),
+            "value": threats,
+            "total": total,
+        })
+    return series
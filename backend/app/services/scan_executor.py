@@ -0,0 +1,85 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.threat_intel import analyze_text, analyze_texts, content_key, threat_intel_service
+
+MODES = ("inline", "thread", "process")
+
+
+class ScanExecutor:
+    """
+    Runs ThreatIntelService scans off the event loop.
+
+    The detectors are pure-Python regex/string work with no real awaits, so
+    running them inline blocks every other request on the worker. "thread"
+    keeps the loop responsive; "process" also spreads scans across cores.
+    The pool is created lazily on first use and torn down in lifespan.
+
+    When a cache is given, results are looked up by content hash (text plus
+    ruleset version) before any work is dispatched.
+    """
+
+    def __init__(self, mode: str = "thread", pool_size: int = 0, cache: Optional[TTLCache] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown SCAN_EXECUTOR '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self._pool: Optional[Executor] = None
+        self.cache = cache
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="scan")
+        return self._pool
+
+    async def scan(self, text: str) -> dict:
+        if self.cache is None:
+            return await self._run(analyze_text, text)
+
+        key = content_key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        result = await self._run(analyze_text, text)
+        self.cache.set(key, result)
+        return dict(result)
+
+    async def scan_batch(self, texts: List[str]) -> List[dict]:
+        if self.cache is None:
+            return await self._run(analyze_texts, texts)
+
+        keys = [content_key(text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fresh = await self._run(analyze_texts, [texts[i] for i in missing])
+            for i, result in zip(missing, fresh):
+                self.cache.set(keys[i], result)
+                results[i] = result
+        return [dict(result) for result in results]
+
+    async def _run(self, fn, arg):
+        if self.mode == "inline":
+            return fn(arg)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), fn, arg)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Caching is only sound when the same text always produces the same verdict
+scan_cache = None
+if threat_intel_service.deterministic and settings.SCAN_CACHE_SIZE > 0:
+    scan_cache = TTLCache(settings.SCAN_CACHE_SIZE, settings.SCAN_CACHE_TTL_SECONDS)
+
+scan_executor = ScanExecutor(settings.SCAN_EXECUTOR, settings.SCAN_POOL_SIZE, scan_cache)
@@ -0,0 +1,350 @@
+import bisect
+import hashlib
+import io
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core import security
+from app.db import migrations
+from app.models.dm_channel import DMChannel
+from app.models.message import Message
+from app.models.user import User
+
+# Synthetic, reproducible datasets at production scale (see seed_db.py).
+# Ids are assigned here rather than by the database, so replies can point at
+# earlier rows of the same batch and every batch is one plain bulk insert.
+
+GROUP_CHANNELS = ["general", "ops", "intel", "logistics", "comms", "medical", "recon", "hq"]
+# Relative traffic per hour of day (UTC): quiet nights, busy working hours
+HOURLY_WEIGHTS = [2, 1, 1, 1, 1, 2, 4, 7, 10, 12, 12, 11, 10, 11, 12, 12, 11, 9, 8, 7, 6, 5, 4, 3]
+
+SAFE_TEXTS = [
+    "Shift change at the usual time, {n} on the roster.", "Can someone send the updated checklist?",
+    "Coffee machine on deck {n} is fixed.", "Thanks, received.", "Running {n} minutes late.",
+    "Weather looks clear for the afternoon.", "Who has the spare keys for vehicle {n}?",
+    "Report {n} uploaded to the shared drive.", "Copy that.", "Lunch is in the east hall today.",
+]
+SENSITIVE_TEXTS = [
+    "Deployment to location {n} moves to 1400 hours.", "Operation alpha briefing, classified, room {n}.",
+    "Rendezvous with bravo at 06:00Z.", "Extract team staged at location {n}.",
+]
+HIGH_TEXTS = [
+    "Convoy {n} confirmed at 34.05N, 118.24W.", "Weapon cache {n} moved north of the river.",
+    "Explosive residue found at checkpoint {n}.", "Hostage situation reported near gate {n}.",
+]
+PHISHING_TEXTS = [
+    "Urgent action: click here to verify account {n}.", "Your password expires today, login at http://bit.ly/{n}.",
+    "Payroll needs your bank account number by noon.", "Update payment details for invoice {n}.",
+]
+ATTACHMENTS = [
+    ("image/png", "png", 120_000), ("image/jpeg", "jpg", 850_000), ("application/pdf", "pdf", 2_400_000),
+    ("text/plain", "txt", 4_000), ("application/zip", "zip", 15_000_000),
+]
+TTL_CHOICES = [timedelta(seconds=30), timedelta(minutes=5), timedelta(hours=1), timedelta(days=1), timedelta(days=7)]
+
+
+def human_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _zipf_cum_weights(n: int, exponent: float) -> List[float]:
+    # A few very active users / channels and a long tail, like real chat traffic
+    total, cum = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** exponent
+        cum.append(total)
+    return cum
+
+
+def _diurnal_fractions() -> Tuple[List[float], List[float]]:
+    # Piecewise-linear CDF of HOURLY_WEIGHTS over a day, for inverse-transform sampling
+    total = sum(HOURLY_WEIGHTS)
+    cdf = [0.0]
+    for weight in HOURLY_WEIGHTS:
+        cdf.append(cdf[-1] + weight / total)
+    return cdf, [hour / 24 for hour in range(25)]
+
+
+class MessageGenerator:
+    """
+    Yields message rows in id order with timestamps spread over [start, end),
+    denser in working hours. Senders and channels follow Zipf-like popularity;
+    a share of messages are DMs, replies, self-destructing or carry attachments.
+    """
+
+    def __init__(self, rng: random.Random, user_ids: List[int], dm_peers: Dict[int, List[int]],
+                 group_channels: List[str], start: datetime, end: datetime, dm_share: float = 0.3):
+        self.rng = rng
+        self.user_ids = user_ids
+        self.dm_peers = dm_peers
+        self.group_channels = group_channels
+        # Hours of day are warped relative to midnight, so working hours land on the clock
+        self.midnight = datetime.combine(start.date(), datetime.min.time())
+        self.offset = (start - self.midnight).total_seconds()
+        self.span = (end - start).total_seconds()
+        self.end = end
+        self.dm_share = dm_share
+        self._user_weights = _zipf_cum_weights(len(user_ids), 0.8)
+        self._channel_weights = _zipf_cum_weights(len(group_channels), 1.1)
+        self._cdf, self._hours = _diurnal_fractions()
+        self._recent: Dict[str, deque] = {}
+        # DM channel -> newest message time, for dm_channels.last_message_at
+        self.dm_last: Dict[str, datetime] = {}
+
+    def _timestamp(self, position: float) -> datetime:
+        # position in [0, 1) of the span; the time of day goes through the diurnal CDF
+        day, fraction = divmod((self.offset + position * self.span) / 86400, 1.0)
+        slot = min(bisect.bisect_right(self._cdf, fraction) - 1, 23)
+        within = (fraction - self._cdf[slot]) / (self._cdf[slot + 1] - self._cdf[slot])
+        seconds = (day + self._hours[slot] + within / 24) * 86400
+        # The partial first and last day can warp past the ends; clamping keeps the order
+        return self.midnight + timedelta(seconds=min(max(seconds, self.offset), self.offset + self.span * 0.999999))
+
+    def rows(self, count: int, first_id: int) -> Iterator[dict]:
+        rng = self.rng
+        random_ = rng.random
+        # bisect over cumulative weights: rng.choices does the same with more overhead per call
+        users, user_cum, user_total = self.user_ids, self._user_weights, self._user_weights[-1]
+        channels, channel_cum, channel_total = self.group_channels, self._channel_weights, self._channel_weights[-1]
+        for n in range(count):
+            message_id = first_id + n
+            timestamp = self._timestamp((n + random_()) / count)
+            sender = users[bisect.bisect(user_cum, random_() * user_total)]
+            receiver = None
+            peers = self.dm_peers.get(sender)
+            if peers and random_() < self.dm_share:
+                receiver = rng.choice(peers)
+                channel_id = f"dm_{min(sender, receiver)}_{max(sender, receiver)}"
+                self.dm_last[channel_id] = timestamp
+            else:
+                channel_id = channels[bisect.bisect(channel_cum, random_() * channel_total)]
+
+            # 88% SAFE / 9% SENSITIVE / 3% HIGH; phishing 92% LOW / 5% MODERATE / 3% HIGH
+            roll = random_()
+            opsec = "SAFE" if roll < 0.88 else "SENSITIVE" if roll < 0.97 else "HIGH"
+            roll = random_()
+            phishing = "LOW" if roll < 0.92 else "MODERATE" if roll < 0.97 else "HIGH"
+            if opsec == "HIGH":
+                template = rng.choice(HIGH_TEXTS)
+            elif opsec == "SENSITIVE":
+                template = rng.choice(SENSITIVE_TEXTS)
+            elif phishing != "LOW":
+                template = rng.choice(PHISHING_TEXTS)
+            else:
+                template = rng.choice(SAFE_TEXTS)
+
+            recent = self._recent.setdefault(channel_id, deque(maxlen=50))
+            reply_to_id = rng.choice(recent) if recent and random_() < 0.12 else None
+            recent.append(message_id)
+
+            file_url = file_type = file_size = integrity_hash = None
+            if random_() < 0.04:
+                file_type, extension, typical = rng.choice(ATTACHMENTS)
+                file_url = f"/uploads/{rng.getrandbits(64):016x}.{extension}"
+                file_size = human_size(int(typical * rng.uniform(0.1, 3)))
+                integrity_hash = hashlib.sha256(file_url.encode()).hexdigest()
+
+            # Only timers still running at `end`: a live database has reaped the rest
+            expiration = None
+            if random_() < 0.03:
+                expiration = timestamp + rng.choice(TTL_CHOICES)
+                if expiration <= self.end:
+                    expiration = None
+
+            yield {
+                "id": message_id,
+                "sender_id": sender,
+                "receiver_id": receiver,
+                "channel_id": channel_id,
+                "content_encrypted": template.format(n=rng.randrange(10000)),
+                "timestamp": timestamp,
+                # Skewed low (mean 25), with a tail of high "AI-like" scores
+                "ai_score": round(random_() * random_() * 100, 2),
+                "opsec_risk": opsec,
+                "phishing_risk": phishing,
+                "is_blocked": opsec == "HIGH",
+                "file_url": file_url,
+                "file_type": file_type,
+                "file_size": file_size,
+                "integrity_hash": integrity_hash,
+                "expiration": expiration,
+                "reply_to_id": reply_to_id,
+                "is_deleted": random_() < 0.01,
+            }
+
+
+def _copy_field(value) -> str:
+    # One field of COPY ... (FORMAT csv), where only an unquoted empty field is NULL
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def bulk_insert(conn: Connection, table: Table, rows: List[dict]) -> None:
+    """
+    COPY ... FROM STDIN on Postgres (pg8000), a driver-level executemany of
+    plain tuples on SQLite, a Core executemany elsewhere. Every row must have
+    the same keys.
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    dialect = conn.dialect
+    if dialect.name == "sqlite":
+        # Skips per-row statement processing; the type processors (datetime and
+        # boolean storage formats) are applied by hand
+        processors = [table.c[c].type.bind_processor(dialect) for c in columns]
+        conn.exec_driver_sql(
+            f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(process(row[c]) if process else row[c] for c, process in zip(columns, processors)) for row in rows],
+        )
+    elif dialect.name == "postgresql":
+        # csv.writer cannot tell None from "" (QUOTE_NONNUMERIC quotes both), so fields
+        # are formatted by hand: NULL is an empty unquoted field, strings are always quoted
+        buffer = io.StringIO()
+        buffer.writelines(",".join(_copy_field(row[c]) for c in columns) + "\n" for row in rows)
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream=buffer)
+        finally:
+            cursor.close()
+    else:
+        conn.execute(table.insert(), rows)
+
+
+def _sync_sequence(conn: Connection, table: Table) -> None:
+    # Explicit ids bypass the Postgres sequence; move it past them
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                          f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"))
+
+
+def drop_message_indexes(conn: Connection) -> None:
+    """
+    Secondary indexes and the search index cost more maintained row by row than
+    built once at the end; restore_message_indexes puts them back.
+    """
+    for index in Message.__table__.indexes:
+        index.drop(bind=conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("DROP INDEX IF EXISTS ix_messages_search_vector"))
+
+
+def restore_message_indexes(conn: Connection) -> None:
+    migrations.create_missing_indexes(conn, Message.__table__)
+    # Recreates the triggers / GIN index; on SQLite also rebuilds the FTS index
+    statements = {"sqlite": migrations.SQLITE_SEARCH_DDL, "postgresql": migrations.POSTGRES_SEARCH_DDL}
+    for statement in statements.get(conn.dialect.name, []):
+        conn.execute(text(statement))
+
+
+def seed_database(engine: Engine, users: int, messages: int, days: float = 90, group_channels: int = 8,
+                  dm_per_user: int = 4, batch_size: int = 20000, seed: int = 1, defer_indexes: bool = True,
+                  progress: Optional[Callable[[str], None]] = print) -> dict:
+    """
+    Add `users` users, their DM channels and `messages` messages spread over the
+    last `days` days to an existing database (migrated to head first).
+    Returns a summary with the new users' emails (password "sentinel").
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda line: None)
+    migrations.upgrade(engine)
+
+    with engine.begin() as conn:
+        first_user = (conn.execute(select(func.max(User.__table__.c.id))).scalar() or 0) + 1
+        first_message = (conn.execute(select(func.max(Message.__table__.c.id))).scalar() or 0) + 1
+
+    # One hash for everyone: pbkdf2 per user would dominate small seeds
+    hashed = security.get_password_hash("sentinel")
+    user_ids = list(range(first_user, first_user + users))
+    user_rows = [{
+        "id": user_id, "email": f"user{user_id}@seed.sentinel.net", "full_name": f"Officer {user_id}",
+        "hashed_password": hashed, "is_active": True, "is_superuser": False,
+        "role": rng.choices(("agent", "commander", "admin"), cum_weights=(90, 99, 100))[0],
+    } for user_id in user_ids]
+
+    # Each user talks to a handful of peers, popular users to more of them
+    dm_peers: Dict[int, List[int]] = {user_id: [] for user_id in user_ids}
+    pairs = set()
+    for user_id in user_ids:
+        for _ in range(rng.randint(0, dm_per_user * 2)):
+            peer = rng.choice(user_ids)
+            pair = (min(user_id, peer), max(user_id, peer))
+            if peer != user_id and pair not in pairs:
+                pairs.add(pair)
+                dm_peers[user_id].append(peer)
+                dm_peers[peer].append(user_id)
+
+    channels = (GROUP_CHANNELS + [f"team-{i}" for i in range(len(GROUP_CHANNELS), group_channels)])[:group_channels]
+    end = datetime.utcnow()
+    generator = MessageGenerator(rng, user_ids, dm_peers, channels, end - timedelta(days=days), end)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, len(user_rows), batch_size):
+            bulk_insert(conn, User.__table__, user_rows[offset:offset + batch_size])
+        _sync_sequence(conn, User.__table__)
+        if defer_indexes and messages:
+            drop_message_indexes(conn)
+    report(f"{users} users, {len(pairs)} DM channels")
+
+    try:
+        batch: List[dict] = []
+        written = 0
+        for row in generator.rows(messages, first_message):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                with engine.begin() as conn:
+                    bulk_insert(conn, Message.__table__, batch)
+                written += len(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                report(f"  {written}/{messages} messages ({written / elapsed:.0f} rows/s)")
+        with engine.begin() as conn:
+            bulk_insert(conn, Message.__table__, batch)
+            _sync_sequence(conn, Message.__table__)
+        written += len(batch)
+    finally:
+        if defer_indexes and messages:
+            report("Building indexes...")
+            with engine.begin() as conn:
+                restore_message_indexes(conn)
+
+    dm_rows = []
+    for u1, u2 in sorted(pairs):
+        channel_id = f"dm_{u1}_{u2}"
+        last = generator.dm_last.get(channel_id)
+        for user_id, peer_id in ((u1, u2), (u2, u1)):
+            dm_rows.append({"channel_id": channel_id, "user_id": user_id, "peer_id": peer_id,
+                            "last_message_at": last, "unread_count": 0})
+    with engine.begin() as conn:
+        for offset in range(0, len(dm_rows), batch_size):
+            bulk_insert(conn, DMChannel.__table__, dm_rows[offset:offset + batch_size])
+
+    return {
+        "users": users,
+        "emails": [row["email"] for row in user_rows],
+        "dm_channels": len(pairs),
+        "group_channels": channels,
+        "messages": written,
+        "first_message_id": first_message,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_minute(ts: datetime) -> int:
+    # Naive UTC timestamps, as stored by Message.timestamp
+    return int((ts - EPOCH).total_seconds() // 60)
+
+
+class ThreatCounters:
+    """
+    Per-minute ring buffers of message counts by opsec_risk.
+
+    The scan handlers call `record` once per committed message and the dashboard
+    reads sums over at most `window_minutes` slots, so stats cost O(1) instead of
+    loading the last hour of messages. State is per process: each worker only
+    counts the scans it handled, so it is rebuilt from the DB periodically
+    (`load_threat_counters`) to pick up the other workers' messages.
+    """
+
+    def __init__(self, window_minutes: int = 60):
+        self.window_minutes = window_minutes
+        self._slot_minute: List[Optional[int]] = [None] * window_minutes
+        self._opsec: List[Counter] = [Counter() for _ in range(window_minutes)]
+        self._lock = threading.Lock()
+        self.ready = False
+        self.loaded_at = 0.0
+
+    def _slot(self, minute: int) -> int:
+        index = minute % self.window_minutes
+        if self._slot_minute[index] != minute:
+            # Slot still holds a minute that fell out of the window: recycle it
+            self._slot_minute[index] = minute
+            self._opsec[index].clear()
+        return index
+
+    def record(self, timestamp: datetime, opsec_risk: Optional[str], count: int = 1) -> None:
+        minute = epoch_minute(timestamp)
+        with self._lock:
+            latest = max((m for m in self._slot_minute if m is not None), default=minute)
+            if minute <= latest - self.window_minutes:
+                return  # Older than anything we keep
+            index = self._slot(minute)
+            self._opsec[index][opsec_risk or "SAFE"] += count
+
+    def rebuild(self, rows: Iterable[tuple]) -> None:
+        """
+        Reset from (timestamp, opsec_risk, count) rows covering the window.
+        """
+        fresh = ThreatCounters(self.window_minutes)
+        for timestamp, opsec_risk, count in rows:
+            fresh.record(timestamp, opsec_risk, count)
+        # Swap in one step, so readers never see a half-built window
+        with self._lock:
+            self._slot_minute, self._opsec = fresh._slot_minute, fresh._opsec
+        self.loaded_at = time.monotonic()
+        self.ready = True
+
+    def age(self) -> float:
+        """
+        Seconds since the last rebuild (infinite before the first one).
+        """
+        return time.monotonic() - self.loaded_at if self.ready else float("inf")
+
+    def _sum(self, first_minute: int, last_minute: int, risks=None, exclude=None) -> int:
+        total = 0
+        with self._lock:
+            for index, minute in enumerate(self._slot_minute):
+                if minute is None or not (first_minute <= minute <= last_minute):
+                    continue
+                for risk, count in self._opsec[index].items():
+                    if (risks is None or risk in risks) and (exclude is None or risk not in exclude):
+                        total += count
+        return total
+
+    def opsec_count(self, now: datetime, minutes: int, risks=None, exclude=None) -> int:
+        last = epoch_minute(now)
+        return self._sum(last - minutes + 1, last, risks, exclude)
+
+    def active_threats(self, now: datetime) -> int:
+        # Rolling count of HIGH OPSEC messages over the whole window (drives DEFCON)
+        return self.opsec_count(now, self.window_minutes, risks={"HIGH"})
+
+    def trend(self, now: datetime, buckets: int = 10, bucket_minutes: int = 5) -> List[dict]:
+        """
+        Non-SAFE message counts in consecutive buckets ending at `now`.
+        """
+        points = []
+        for i in range(buckets):
+            t = now - timedelta(minutes=(buckets - i) * bucket_minutes)
+            first = epoch_minute(t)
+            points.append({
+                "time": t,
+                "value": self._sum(first, first + bucket_minutes - 1, exclude={"SAFE"}),
+            })
+        return points
+
+
+threat_counters = ThreatCounters()
+
+
+def load_threat_counters(db, now: Optional[datetime] = None) -> None:
+    """
+    Rebuild the live counters from the last window of messages, counted per minute
+    in SQL (at most window_minutes x risk levels rows come back).
+    """
+    from sqlalchemy import func
+    from app.models.message import Message
+    from app.services.rollups import epoch_bucket
+
+    now = now or datetime.utcnow()
+    minute = epoch_bucket(Message.timestamp, 60, db.get_bind().dialect.name)
+    rows = db.query(minute, Message.opsec_risk, func.count()).filter(
+        Message.timestamp > now - timedelta(minutes=threat_counters.window_minutes)
+    ).group_by(minute, Message.opsec_risk).all()
+    threat_counters.rebuild(
+        (EPOCH + timedelta(seconds=int(seconds)), opsec_risk, count)
+        for seconds, opsec_risk, count in rows
+    )
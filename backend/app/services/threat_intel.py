@@ -1,125 +1,206 @@
+import hashlib
 import random
 import re
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.keyword_matcher import KeywordMatcher
+
+# Keyword rulesets, grouped by the detector category they feed
+# LLMs often use specific transitional phrases and neutral tones
+ARTIFACTS = [
+    "as an ai", "cannot generate", "regenerate", "model", "context",
+    "in summary", "furthermore", "it is important to note",
+    "based on the information", "certainly!", "here is the"
+]
+CRITICAL = ["bomb", "attack", "kill", "assassinate", "terrorism", "explosive", "weapon", "hostage", "nuclear", "rape"]
+SENSITIVE = ["deployment", "location", "alpha", "bravo", "classified", "operation", "extract", "rendezvous"]
+ACTIONS = ["click here", "login", "password", "verify account", "urgent action", "update payment"]
+PII_REQUEST = ["ssn", "social security", "credit card", "bank account"]
+
+# Compiled once at import instead of on every detector call
+# Matches: 34.05N, 118.24W or similar
+COORD_PATTERN = re.compile(r'\d{1,3}\.\d+[NS],\s*\d{1,3}\.\d+[EW]')
+# Matches: 1400 hours, 14:00Z
+TIME_PATTERN = re.compile(r'\d{4}\s*hours|\d{2}:\d{2}Z')
+# Matches http://bit.ly/... or raw IP
+SUSPICIOUS_URLS = re.compile(r'http[s]?://(?:\d{1,3}\.|bit\.ly|tinyurl)')
+SENTENCE_SPLIT = re.compile(r'[.!?]+')
+PUNCTUATION = re.compile(r'[.,;!?]')
+
+KeywordHits = Dict[str, Set[str]]
+
+# Bump DETECTOR_REVISION when scoring logic changes; keyword/regex edits change the hash on their own
+DETECTOR_REVISION = 2
+RULESET_VERSION = hashlib.sha256(repr((
+    DETECTOR_REVISION, ARTIFACTS, CRITICAL, SENSITIVE, ACTIONS, PII_REQUEST,
+    COORD_PATTERN.pattern, TIME_PATTERN.pattern, SUSPICIOUS_URLS.pattern,
+)).encode()).hexdigest()[:12]
+
+def content_key(text: str) -> str:
+    # Content address of a text under the current ruleset (used for caching and seeding)
+    return hashlib.sha256(f"{RULESET_VERSION}:{text}".encode()).hexdigest()
 
 class ThreatIntelService:
-    def __init__(self):
+    def __init__(self, deterministic: bool = False):
+        # Deterministic mode derives the simulated model confidence from the text itself,
+        # so the same text always scores the same (required for result caching)
+        self.deterministic = deterministic
         # In a real scenario, load models here:
         # self.ai_detector = pipeline("text-classification", model="roberta-base-openai-detector")
-        pass
+        self.matcher = KeywordMatcher({
+            "artifact": ARTIFACTS,
+            "critical": CRITICAL,
+            "sensitive": SENSITIVE,
+            "action": ACTIONS,
+            "pii": PII_REQUEST,
+        })
+
+    def match_keywords(self, text: str) -> KeywordHits:
+        # One linear pass over the lowercased text covers every detector's keyword list
+        return self.matcher.scan(text.lower())
+
+    # Detectors are pure CPU work, so they are synchronous: the scan executor
+    # runs them in a thread or process pool.
 
-    async def detect_ai_generated(self, text: str) -> float:
+    def ai_score(self, text: str, hits: Optional[KeywordHits] = None) -> float:
         # Advanced Transformer Pattern Analysis (Simulated)
         # Mimics BERT/RoBERTa classification features
         
-        text_lower = text.lower()
-        score = 0.0
-        
+        if hits is None:
+            hits = self.match_keywords(text)
+
         # 1. Transformer Artifacts (Common generative patterns)
-        # LLMs often use specific transitional phrases and neutral tones
-        artifacts = [
-            "as an ai", "cannot generate", "regenerate", "model", "context",
-            "in summary", "furthermore", "it is important to note", 
-            "based on the information", "certainly!", "here is the"
-        ]
-        artifact_hits = sum(1 for phrase in artifacts if phrase in text_lower)
+        # 2-3. Perplexity / Burstiness proxies, only needed when no artifact matched
+        artifact_hits = len(hits["artifact"])
+        style_score = 0.0 if artifact_hits else self.stylometry_scores(self.stylometry([text]))[0]
+        return self.combine_ai_score(text, artifact_hits, style_score)
+
+    def combine_ai_score(self, text: str, artifact_hits: int, style_score: float) -> float:
         if artifact_hits > 0:
             return min(85.0 + (artifact_hits * 10), 99.9)
 
-        # 2. Perplexity / Entropy Proxy
-        # AI text often has "perfect" grammar and median sentence length
-        words = text.split()
-        if len(words) > 10:
-            # Vocabulary Richness (Type-Token Ratio)
-            unique_words = len(set(words))
-            ttr = unique_words / len(words)
-            
-            # Low TTR (< 0.5) implies repetition typical of some bot output
-            # High TTR (> 0.9) in long text implies forced randomness
-            if ttr < 0.5:
-                score += 15
-            
-            # Sentence Structure Analysis
-            sentences = re.split(r'[.!?]+', text)
-            sentences = [s for s in sentences if s.strip()]
-            if sentences:
-                avg_len = sum(len(s.split()) for s in sentences) / len(sentences)
-                # AI tends to average 15-20 words per sentence in formal modes
-                if 12 <= avg_len <= 25:
-                    score += 10
-                    
-                # Standard Deviation of sentence length (AI is often more uniform)
-                variance = sum((len(s.split()) - avg_len) ** 2 for s in sentences) / len(sentences)
-                if variance < 20: # Very uniform sentence lengths
-                    score += 15
-
-        # 3. Burstiness Analysis (Human text is bursty, AI is smooth)
-        # We detect "smoothness" by checking punctuation distribution
-        if len(text) > 50:
-            punctuation_count = len(re.findall(r'[.,;!?]', text))
-            ratio = punctuation_count / len(words)
-            if 0.05 < ratio < 0.08: # "Perfect" punctuation ratio
-                score += 10
-
         # Base probability from "BERT" model simulation
-        base_confidence = random.uniform(10.0, 30.0) 
-        final_score = base_confidence + score
+        base_confidence = self.base_confidence(text)
+        final_score = base_confidence + style_score
         
         return min(max(final_score, 0.0), 98.5)
 
-    async def detect_opsec_risk(self, text: str) -> str:
-        text_lower = text.lower()
-        
+    def base_confidence(self, text: str) -> float:
+        if not self.deterministic:
+            return random.uniform(10.0, 30.0)
+        # Map the first 8 bytes of the content hash onto the same 10-30 range
+        fraction = int(content_key(text)[:16], 16) / float(1 << 64)
+        return 10.0 + fraction * 20.0
+
+    def stylometry(self, texts: List[str]) -> Dict[str, list]:
+        """
+        Column-wise stylometric features for a batch of texts.
+        Each column holds one entry per text (None where the feature does not apply),
+        so a whole batch is measured in one sweep and scored column by column.
+        """
+        columns: Dict[str, list] = {"ttr": [], "avg_len": [], "variance": [], "punct_ratio": []}
+        for text in texts:
+            # AI text often has "perfect" grammar and median sentence length
+            words = text.split()
+            ttr = avg_len = variance = punct_ratio = None
+            if len(words) > 10:
+                # Vocabulary Richness (Type-Token Ratio)
+                ttr = len(set(words)) / len(words)
+
+                # Sentence Structure Analysis
+                lengths = [len(s.split()) for s in SENTENCE_SPLIT.split(text) if s.strip()]
+                if lengths:
+                    avg_len = sum(lengths) / len(lengths)
+                    variance = sum((n - avg_len) ** 2 for n in lengths) / len(lengths)
+
+            # Burstiness: Human text is bursty, AI is smooth
+            if len(text) > 50 and words:
+                punct_ratio = len(PUNCTUATION.findall(text)) / len(words)
+
+            columns["ttr"].append(ttr)
+            columns["avg_len"].append(avg_len)
+            columns["variance"].append(variance)
+            columns["punct_ratio"].append(punct_ratio)
+        return columns
+
+    def stylometry_scores(self, features: Dict[str, list]) -> List[float]:
+        # Low TTR (< 0.5) implies repetition typical of some bot output
+        # High TTR (> 0.9) in long text implies forced randomness
+        ttr_scores = [15 if v is not None and v < 0.5 else 0 for v in features["ttr"]]
+        # AI tends to average 15-20 words per sentence in formal modes
+        avg_scores = [10 if v is not None and 12 <= v <= 25 else 0 for v in features["avg_len"]]
+        # Standard Deviation of sentence length (AI is often more uniform)
+        var_scores = [15 if v is not None and v < 20 else 0 for v in features["variance"]]
+        # "Perfect" punctuation ratio
+        punct_scores = [10 if v is not None and 0.05 < v < 0.08 else 0 for v in features["punct_ratio"]]
+        return [float(sum(col)) for col in zip(ttr_scores, avg_scores, var_scores, punct_scores)]
+
+    def opsec_risk(self, text: str, hits: Optional[KeywordHits] = None) -> str:
         # 1. Critical Geo-spatial Data (Regex)
-        # Matches: 34.05N, 118.24W or similar
-        coord_pattern = re.compile(r'\d{1,3}\.\d+[NS],\s*\d{1,3}\.\d+[EW]')
-        if coord_pattern.search(text):
+        if COORD_PATTERN.search(text):
             return "HIGH"
 
         # 2. Military Time / Specific Dates
-        # Matches: 1400 hours, 14:00Z
-        time_pattern = re.compile(r'\d{4}\s*hours|\d{2}:\d{2}Z')
-        if time_pattern.search(text):
+        if TIME_PATTERN.search(text):
             return "SENSITIVE"
 
         # 3. Keyword Analysis
-        critical = ["bomb", "attack", "kill", "assassinate", "terrorism", "explosive", "weapon", "hostage", "nuclear", "rape"]
-        sensitive = ["deployment", "location", "alpha", "bravo", "classified", "operation", "extract", "rendezvous"]
-        
-        if any(w in text_lower for w in critical):
+        if hits is None:
+            hits = self.match_keywords(text)
+
+        if hits["critical"]:
             return "HIGH"
             
-        count = sum(1 for w in sensitive if w in text_lower)
+        count = len(hits["sensitive"])
         if count >= 2:
             return "SENSITIVE"
             
         return "SAFE"
 
-    async def detect_phishing(self, text: str) -> str:
-        text_lower = text.lower()
-        
+    def phishing_risk(self, text: str, hits: Optional[KeywordHits] = None) -> str:
+        if hits is None:
+            hits = self.match_keywords(text)
+
         # 1. Suspicious Actions
-        actions = ["click here", "login", "password", "verify account", "urgent action", "update payment"]
-        if any(s in text_lower for s in actions):
+        if hits["action"]:
             return "HIGH"
             
         # 2. Suspicious Domains (Regex primitive)
-        # Matches http://bit.ly/... or raw IP
-        suspicious_urls = re.compile(r'http[s]?://(?:\d{1,3}\.|bit\.ly|tinyurl)')
-        if suspicious_urls.search(text):
+        if SUSPICIOUS_URLS.search(text):
             return "HIGH"
             
         # 3. PII Request
-        pii_request = ["ssn", "social security", "credit card", "bank account"]
-        if any(p in text_lower for p in pii_request):
+        if hits["pii"]:
             return "MODERATE"
             
         return "LOW"
 
-    async def scan_message(self, text: str) -> dict:
-        ai_score = await self.detect_ai_generated(text)
-        opsec_risk = await self.detect_opsec_risk(text)
-        phishing_risk = await self.detect_phishing(text)
-        
+    def analyze(self, text: str) -> dict:
+        hits = self.match_keywords(text)
+        ai_score = self.ai_score(text, hits)
+        opsec_risk = self.opsec_risk(text, hits)
+        phishing_risk = self.phishing_risk(text, hits)
+
+        return self.build_verdict(ai_score, opsec_risk, phishing_risk)
+
+    def analyze_batch(self, texts: List[str]) -> List[dict]:
+        """
+        Scan many texts together. Keyword hits are collected per text, stylometric
+        features are computed once for the whole batch, and results keep input order.
+        """
+        all_hits = [self.match_keywords(text) for text in texts]
+        style_scores = self.stylometry_scores(self.stylometry(texts))
+
+        results = []
+        for text, hits, style_score in zip(texts, all_hits, style_scores):
+            ai_score = self.combine_ai_score(text, len(hits["artifact"]), style_score)
+            opsec_risk = self.opsec_risk(text, hits)
+            phishing_risk = self.phishing_risk(text, hits)
+            results.append(self.build_verdict(ai_score, opsec_risk, phishing_risk))
+        return results
+
+    def build_verdict(self, ai_score: float, opsec_risk: str, phishing_risk: str) -> dict:
         explanation = []
         if ai_score > 70:
             explanation.append("High probability of AI generation detected.")
@@ -138,7 +219,11 @@ class ThreatIntelService:
             "explanation": " | ".join(explanation)
         }
 
-threat_intel_service = ThreatIntelService()
+threat_intel_service = ThreatIntelService(deterministic=settings.SCAN_DETERMINISTIC)
+
+# Module-level entry points are picklable, so process-pool workers can call them
+def analyze_text(text: str) -> dict:
+    return threat_intel_service.analyze(text)
 
-async def scan_message(text: str) -> dict:
-    return await threat_intel_service.scan_message(text)
+def analyze_texts(texts: List[str]) -> List[dict]:
+    return threat_intel_service.analyze_batch(texts)
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.models.message import Message
+from app.services.rollups import fold_deleted
+
+
+class TTLReaper:
+    """
+    Deletes expired (self-destructing) messages in the background.
+
+    Every `interval_seconds` it walks ix_messages_expiration in chunks of
+    `chunk_size` rows, each chunk in its own short transaction, so a backlog
+    never holds the write lock for long. Replies to a reaped message keep their
+    own row and lose the reference; the dashboard history keeps counting the
+    reaped rows (rollups.fold_deleted). Between runs an expired message can still
+    be in the table for up to one interval; readers hide it themselves.
+    """
+
+    def __init__(self, session_factory, interval_seconds: float, chunk_size: int):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.chunk_size = max(1, chunk_size)
+        self.runs = 0
+        self.rows_reaped = 0
+        self.errors = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_rows = 0
+        self.last_run_ms = 0.0
+        # How long the oldest row reaped in the last run had been expired
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None and self.interval_seconds > 0
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"TTL reaper failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def reap_chunk(self, db: AsyncSession, now: datetime) -> list:
+        """
+        Delete up to `chunk_size` expired messages and commit. Returns the (id, expiration)
+        rows that were removed.
+        """
+        expired = (await db.execute(
+            select(Message.id, Message.expiration)
+            .where(Message.expiration <= now)
+            .order_by(Message.expiration)
+            .limit(self.chunk_size)
+        )).all()
+        if not expired:
+            return []
+        ids = [row.id for row in expired]
+        # Self-destructed messages stay in the dashboard history
+        await db.run_sync(fold_deleted, Message.id.in_(ids))
+        await db.execute(
+            update(Message).where(Message.reply_to_id.in_(ids)).values(reply_to_id=None)
+            .execution_options(synchronize_session=False))
+        await db.execute(delete(Message).where(Message.id.in_(ids)).execution_options(synchronize_session=False))
+        await db.commit()
+        return expired
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        reaped = 0
+        oldest: Optional[datetime] = None
+        async with self.session_factory() as db:
+            while True:
+                expired = await self.reap_chunk(db, now)
+                if not expired:
+                    break
+                if oldest is None:
+                    oldest = expired[0].expiration
+                reaped += len(expired)
+                if len(expired) < self.chunk_size:
+                    break
+                # Let request handlers (and the message writer) in between chunks
+                await asyncio.sleep(0)
+
+        self.runs += 1
+        self.rows_reaped += reaped
+        self.last_run_at = now
+        self.last_run_rows = reaped
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.last_lag_seconds = round((now - oldest).total_seconds(), 3) if oldest else 0.0
+        self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+        return reaped
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "interval_seconds": self.interval_seconds,
+            "chunk_size": self.chunk_size,
+            "runs": self.runs,
+            "rows_reaped": self.rows_reaped,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_run_rows": self.last_run_rows,
+            "last_run_ms": self.last_run_ms,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+        }
+
+
+ttl_reaper = TTLReaper(
+    db_session.AsyncSessionLocal,
+    interval_seconds=settings.TTL_REAPER_INTERVAL_SECONDS,
+    chunk_size=settings.TTL_REAPER_CHUNK_SIZE,
+)
@@ -0,0 +1,42 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.models.message import Message # Import all models to ensure they are registered
+from app.services.archive import archive_cutoffs, archive_messages, message_archive
+from datetime import datetime
+
+# Move old messages into cold storage once (e.g. from cron instead of the in-process scheduler).
+# Usage:
+#   python archive_messages.py                 use ARCHIVE_AFTER_DAYS / ARCHIVE_CHANNEL_DAYS
+#   python archive_messages.py <days>          archive every channel older than <days>
+
+def main(argv):
+    if argv:
+        settings.ARCHIVE_AFTER_DAYS = float(argv[0])
+    if not any(archive_cutoffs(datetime.utcnow()).values()):
+        print("Archiving disabled: set ARCHIVE_AFTER_DAYS or ARCHIVE_CHANNEL_DAYS (or pass <days>)")
+        return 1
+
+    print(f"--- ARCHIVING TO {os.path.abspath(message_archive.root)} ---")
+    db = SessionLocal()
+    try:
+        moved = archive_messages(db, message_archive)
+    except Exception as e:
+        print(f"Archival failed: {e}")
+        return 1
+    finally:
+        db.close()
+
+    for channel_id, count in sorted(moved.items()):
+        print(f"  {channel_id}: {count} messages")
+    print(f"--- ARCHIVED {sum(moved.values())} MESSAGES ---")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,395 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+
+import argparse
+import asyncio
+import contextvars
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+# In-process load test: drives the FastAPI app through httpx's ASGI transport
+# against a freshly seeded SQLite database in a scratch directory, one scenario
+# at a time, and reports per-endpoint latency percentiles, throughput and
+# database queries per request.
+#   chat_polling       newest page, then after_id polls, every 10th poll a before_id page
+#   scan_burst         /threat-intel/scan, every 5th call a /scan/batch of 20
+#   dm_listing         /chat/dms as different users
+#   dashboard_viewers  /dashboard/stats
+#   mixed              all of the above at once
+#   scan_flood         waves of simultaneous /threat-intel/scan calls, more than the
+#                      async pool has connections; any failed call fails the run
+# Results are written as JSON; --baseline compares against an earlier run and
+# exits with 1 when a p95 latency or a throughput regressed beyond --tolerance.
+# Usage: python bench_api.py [--duration 10] [--users 16] [--messages 20000]
+#                            [--scenarios chat_polling,mixed] [--out FILE] [--baseline FILE]
+
+SCENARIOS = ("chat_polling", "scan_burst", "dm_listing", "dashboard_viewers", "mixed", "scan_flood")
+CHANNELS = ("general", "ops", "intel")
+TEXTS = (
+    "convoy departs at 0600 from grid {n}",
+    "click here to verify your password, account {n} suspended",
+    "lunch at noon? table for {n}",
+    "patrol report {n}: sector quiet",
+    "urgent: wire transfer {n} needed before EOD",
+    "meeting moved to room {n}",
+)
+
+# Endpoint of the request running in the current task; queries issued from it are
+# counted against that endpoint, anything else (writer, reaper) as "background"
+_endpoint = contextvars.ContextVar("bench_endpoint", default=None)
+# Recorder of the running scenario, fed by the query listener
+_active_recorder = None
+
+
+def percentile(sorted_values, p: float) -> float:
+    # Nearest rank on an already sorted list
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _count_query(*args) -> None:
+    if _active_recorder is not None:
+        _active_recorder.count_query()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.queries = Counter()
+
+    def count_query(self) -> None:
+        self.queries[_endpoint.get() or "background"] += 1
+
+    async def call(self, client, method: str, path: str, **kwargs):
+        name = f"{method} {path}"
+        _endpoint.set(name)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except Exception:
+            # Raised by the app through the ASGI transport: counts as a failed request
+            self.latencies[name].append(time.perf_counter() - start)
+            self.errors[name] += 1
+            raise
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, seconds: float) -> dict:
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(values) / seconds, 1),
+                "mean_ms": round(statistics.fmean(values) * 1000, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+                "queries_per_request": round(self.queries[name] / len(values), 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "seconds": round(seconds, 2),
+            "requests": total,
+            "throughput_rps": round(total / seconds, 1),
+            "background_queries": self.queries["background"],
+            "endpoints": endpoints,
+        }
+
+
+def seed(users: int, messages: int, rng: random.Random) -> None:
+    """
+    Bulk-load users, DM channels and messages with Core executemany, so a
+    20k-message database is ready in about a second.
+    """
+    from app.core.security import get_password_hash
+    from app.db import migrations
+    from app.db.session import engine, SessionLocal
+    from app.models.message import Message
+    from app.models.user import User
+    from app.services.dm_channels import ensure_dm_members
+
+    migrations.upgrade(engine)
+    hashed = get_password_hash("bench")
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"email": f"bench{i}@sentinel.net", "full_name": f"Bench Officer {i}",
+             "hashed_password": hashed, "is_active": True}
+            for i in range(users)
+        ])
+    db = SessionLocal()
+    try:
+        user_ids = [u.id for u in db.query(User.id).filter(User.email.like("bench%"))]
+        dm_channels = []
+        for i, u1 in enumerate(user_ids):
+            for u2 in user_ids[i + 1:i + 4]:
+                channel_id = f"dm_{min(u1, u2)}_{max(u1, u2)}"
+                ensure_dm_members(db, channel_id, u1, u2)
+                dm_channels.append((channel_id, u1, u2))
+        db.commit()
+    finally:
+        db.close()
+
+    now = datetime.utcnow()
+    rows = []
+    for n in range(messages):
+        if n % 4 == 3:
+            channel_id, u1, u2 = rng.choice(dm_channels)
+            sender, receiver = (u1, u2) if n % 2 else (u2, u1)
+        else:
+            channel_id, sender, receiver = rng.choice(CHANNELS), rng.choice(user_ids), None
+        opsec = rng.choices(("SAFE", "SENSITIVE", "HIGH"), weights=(85, 12, 3))[0]
+        rows.append({
+            "sender_id": sender,
+            "receiver_id": receiver,
+            "channel_id": channel_id,
+            "content_encrypted": rng.choice(TEXTS).format(n=n),
+            # Oldest first, so ids follow timestamps as they do live
+            "timestamp": now - timedelta(seconds=(messages - n) * 8),
+            "ai_score": round(rng.uniform(5, 95), 2),
+            "opsec_risk": opsec,
+            "phishing_risk": rng.choices(("LOW", "MODERATE", "HIGH"), weights=(90, 7, 3))[0],
+            "is_blocked": opsec == "HIGH",
+            "is_deleted": False,
+        })
+    with engine.begin() as conn:
+        for start in range(0, len(rows), 5000):
+            conn.execute(Message.__table__.insert(), rows[start:start + 5000])
+
+
+async def run_scenario(name: str, client, tokens: list, users: int, duration: float, rng: random.Random) -> dict:
+    from app.db import session as db_session
+
+    global _active_recorder
+    recorder = _active_recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    def headers(vu: int) -> dict:
+        return {"Authorization": f"Bearer {tokens[vu % len(tokens)]}"}
+
+    async def chat_polling(vu: int):
+        channel_id = CHANNELS[vu % len(CHANNELS)]
+        page = (await recorder.call(client, "GET", "/api/v1/chat/messages", headers=headers(vu),
+                                    params={"channel_id": channel_id, "limit": 50})).json()
+        last_id, oldest_id, polls = page[-1]["id"], page[0]["id"], 0
+        while time.perf_counter() < deadline:
+            polls += 1
+            if polls % 10 == 0:
+                older = (await recorder.call(client, "GET", "/api/v1/chat/messages", headers=headers(vu),
+                                             params={"channel_id": channel_id, "limit": 50, "before_id": oldest_id})).json()
+                if older:
+                    oldest_id = older[0]["id"]
+                continue
+            newer = (await recorder.call(client, "GET", "/api/v1/chat/messages", headers=headers(vu),
+                                         params={"channel_id": channel_id, "limit": 50, "after_id": last_id})).json()
+            if newer:
+                last_id = newer[-1]["id"]
+
+    def scan_item() -> dict:
+        return {"lines": rng.choice(TEXTS).format(n=rng.randrange(10 ** 6)), "channel_id": rng.choice(CHANNELS),
+                "integrity_hash": f"{rng.getrandbits(64):016x}"}
+
+    async def scan_burst(vu: int):
+        calls = 0
+        while time.perf_counter() < deadline:
+            calls += 1
+            if calls % 5 == 0:
+                await recorder.call(client, "POST", "/api/v1/threat-intel/scan/batch", headers=headers(vu),
+                                    json=[scan_item() for _ in range(20)])
+            else:
+                await recorder.call(client, "POST", "/api/v1/threat-intel/scan", headers=headers(vu), json=scan_item())
+
+    async def scan_flood(vu: int):
+        # Each request session holds a pooled connection until it hands its row to the
+        # message writer, whose own session needs one from the same pool
+        pool = db_session.async_engine.pool
+        callers = pool.size() + pool._max_overflow + users
+
+        async def one(caller: int):
+            try:
+                await recorder.call(client, "POST", "/api/v1/threat-intel/scan", headers=headers(caller), json=scan_item())
+            except Exception:
+                pass  # Recorded as an error (e.g. the pool's TimeoutError); keep the wave going
+
+        while time.perf_counter() < deadline:
+            await asyncio.gather(*(one(caller) for caller in range(callers)))
+
+    async def dm_listing(vu: int):
+        while time.perf_counter() < deadline:
+            await recorder.call(client, "GET", "/api/v1/chat/dms", headers=headers(vu))
+
+    async def dashboard_viewers(vu: int):
+        while time.perf_counter() < deadline:
+            await recorder.call(client, "GET", "/api/v1/dashboard/stats", headers=headers(vu))
+
+    loops = {"chat_polling": chat_polling, "scan_burst": scan_burst,
+             "dm_listing": dm_listing, "dashboard_viewers": dashboard_viewers}
+    if name == "scan_flood":
+        plan = [(scan_flood, 1)]
+    elif name == "mixed":
+        # Pollers dominate real traffic; a quarter of the users for each of the others
+        share = max(1, users // 4)
+        plan = [(chat_polling, users)] + [(loop, share) for loop in (scan_burst, dm_listing, dashboard_viewers)]
+    else:
+        plan = [(loops[name], users)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*[loop(vu) for loop, count in plan for vu in range(count)])
+    _active_recorder = None
+    return recorder.report(time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+    from app.core.security import create_access_token
+    from app.db import session as db_session
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    seed(args.seed_users, args.messages, rng)
+    seed_seconds = time.perf_counter() - started
+
+    for bound in {db_session.engine, db_session.async_engine.sync_engine}:
+        event.listen(bound, "before_cursor_execute", _count_query)
+
+    tokens = [create_access_token({"sub": f"bench{i}@sentinel.net"}, expires_delta=timedelta(hours=1))
+              for i in range(args.seed_users)]
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=60) as client:
+            # Warm-up outside any scenario: starts the message writer (its queries then
+            # count as background), fills the principal cache and compiles queries
+            auth = {"Authorization": f"Bearer {tokens[0]}"}
+            await client.post("/api/v1/threat-intel/scan", headers=auth, json={"lines": "warm-up"})
+            await client.get("/api/v1/chat/messages", headers=auth)
+            for token in tokens:
+                await client.get("/api/v1/chat/dms", headers={"Authorization": f"Bearer {token}"})
+
+            for name in args.scenarios:
+                print(f"--- {name}: {args.users} users for {args.duration:g}s ---")
+                results[name] = await run_scenario(name, client, tokens, args.users, args.duration, rng)
+                print_report(results[name])
+
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed_seconds": round(seed_seconds, 2),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        },
+        "scenarios": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict) -> None:
+    print(f"  {report['requests']} requests in {report['seconds']}s ({report['throughput_rps']} req/s)")
+    print(f"  {'endpoint':<38} {'n':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6} {'err':>4}")
+    for name, e in report["endpoints"].items():
+        print(f"  {name:<38} {e['requests']:>6} {e['throughput_rps']:>8} {e['p50_ms']:>8} {e['p95_ms']:>8} "
+              f"{e['p99_ms']:>8} {e['queries_per_request']:>6} {e['errors']:>4}")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print p95 / throughput changes per endpoint; True if anything regressed beyond `tolerance`.
+    """
+    regressed = False
+    print(f"--- COMPARED WITH {baseline['meta'].get('commit')} (tolerance {tolerance:.0%}) ---")
+    if baseline["meta"].get("args") != current["meta"]["args"]:
+        print(f"  note: different settings, baseline ran with {baseline['meta'].get('args')}")
+    for scenario, report in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            continue
+        for name, e in report["endpoints"].items():
+            old = before["endpoints"].get(name)
+            if old is None:
+                continue
+            p95 = e["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+            rps = e["throughput_rps"] / old["throughput_rps"] - 1 if old["throughput_rps"] else 0.0
+            flag = p95 > tolerance or rps < -tolerance
+            regressed |= flag
+            print(f"  [{'REGRESSION' if flag else 'ok'}] {scenario} {name}: p95 {old['p95_ms']} -> {e['p95_ms']} ms "
+                  f"({p95:+.0%}), {old['throughput_rps']} -> {e['throughput_rps']} req/s ({rps:+.0%})")
+    return regressed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users per scenario")
+    parser.add_argument("--messages", type=int, default=20000, help="seeded messages")
+    parser.add_argument("--seed-users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--out", default=None, help="result file (default bench_results/api-<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    out = os.path.abspath(args.out or os.path.join(
+        BACKEND_DIR, "bench_results", f"api-{datetime.utcnow():%Y%m%d-%H%M%S}.json"))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # The app picks its database and archive directory at import. Drop everything that
+    # points it at real ones (DATABASE_URL, the Vercel /tmp database, ARCHIVE_DIR) and
+    # run from a scratch directory, so it falls back to a fresh ./sentinelnet.db there
+    for name in ("DATABASE_URL", "VERCEL", "ARCHIVE_DIR"):
+        if os.environ.pop(name, None) is not None:
+            print(f"note: ignoring {name}, the benchmark always runs on a scratch SQLite database")
+    os.chdir(tempfile.mkdtemp(prefix="sentinelnet-bench-"))
+    results = asyncio.run(run(args))
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"--- RESULTS WRITTEN TO {out} ---")
+
+    flood = results["scenarios"].get("scan_flood")
+    if flood and any(e["errors"] for e in flood["endpoints"].values()):
+        print("--- SCAN_FLOOD FAILED: concurrent scans errored (connection pool exhausted?) ---")
+        return 1
+    if baseline is not None and compare(results, baseline, args.tolerance):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,229 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+from app.services.threat_intel import RULESET_VERSION, ThreatIntelService
+
+# Microbenchmark of the threat detectors on a reproducible synthetic corpus:
+# benign, OPSEC-heavy, phishing and AI-like texts from 10 characters to 100 KB.
+# Each detector and the full scan are timed separately (ns per character, best
+# of --repeat runs) and their allocations measured with tracemalloc.
+# Verdicts of the whole corpus can be saved and checked later, so a detector
+# optimization can prove it changed nothing but speed:
+#   python bench_detectors.py --save-verdicts before.json     (on the old code)
+#   python bench_detectors.py --check-verdicts before.json    (exit code 1 on any difference)
+# Scoring changes are expected to fail the check: bump DETECTOR_REVISION and re-save.
+# Usage: python bench_detectors.py [--lengths 10,100,1000,10000,100000] [--out FILE]
+
+CATEGORIES = {
+    "benign": [
+        "Lunch at noon works for me.", "Can you send the slides when you get a chance?",
+        "The coffee place on fifth street reopened.", "See you at the gym later!",
+        "My sister's flight got delayed again, so dinner moves to Friday.",
+        "Honestly the match last night was a mess, we should have won.",
+        "Remember to water the plants while I'm away.", "Thanks, that fixed it.",
+    ],
+    "opsec": [
+        "Convoy reaches 34.05N, 118.24W at 1400 hours.", "Operation bravo deployment is classified.",
+        "Rendezvous at the extract location at 06:00Z.", "The weapon cache sits near alpha.",
+        "Hostage team moves on the location before dawn.", "Keep the classified operation off this channel.",
+    ],
+    "phishing": [
+        "Urgent action required: click here to verify account.",
+        "Your password expires today, login at http://bit.ly/secure-update to keep access.",
+        "Please confirm your credit card and social security number.",
+        "We detected unusual activity, update payment details at https://tinyurl.com/acct.",
+        "Your bank account is locked until you verify account ownership.",
+    ],
+    "ai_like": [
+        "Certainly! Here is the summary you asked for.",
+        "It is important to note that the context of the request matters.",
+        "Furthermore, based on the information provided, the plan appears sound.",
+        "In summary, the approach balances cost, risk and schedule effectively.",
+        "The proposal outlines three phases, each with clear owners and measurable goals.",
+        "Overall, the team should review the findings and agree on the next steps.",
+    ],
+}
+# Filler keeps long texts varied (vocabulary richness feeds the stylometry features)
+FILLER = ["report", "north", "team", "window", "signal", "river", "budget", "review", "quiet", "orange",
+          "schedule", "update", "harbor", "ticket", "garden", "station", "morning", "design", "copper", "field"]
+DEFAULT_LENGTHS = (10, 100, 1000, 10000, 100000)
+
+
+def build_corpus(lengths, seed: int) -> list:
+    """
+    [(category, length, text)], identical for the same lengths and seed.
+    Each text mixes sentences of its category with benign sentences and filler.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for length in lengths:
+        samples = 20 if length <= 1000 else 5 if length <= 10000 else 2
+        for category, sentences in CATEGORIES.items():
+            for _ in range(samples):
+                parts, size = [], 0
+                while size < length:
+                    roll = rng.random()
+                    if roll < 0.6:
+                        part = rng.choice(sentences)
+                    elif roll < 0.8:
+                        part = rng.choice(CATEGORIES["benign"])
+                    else:
+                        part = " ".join(rng.choice(FILLER) for _ in range(rng.randint(3, 12))).capitalize() + "."
+                    parts.append(part)
+                    size += len(part) + 1
+                corpus.append((category, length, " ".join(parts)[:length]))
+    return corpus
+
+
+def corpus_digest(corpus) -> str:
+    return hashlib.sha256("\0".join(text for _, _, text in corpus).encode()).hexdigest()[:16]
+
+
+def detectors(service: ThreatIntelService) -> dict:
+    # Rule detectors get precomputed keyword hits, as analyze() passes them
+    return {
+        "keywords": lambda text, hits: service.match_keywords(text),
+        "ai_score": lambda text, hits: service.ai_score(text, hits),
+        "opsec_risk": lambda text, hits: service.opsec_risk(text, hits),
+        "phishing_risk": lambda text, hits: service.phishing_risk(text, hits),
+        "scan_message": lambda text, hits: service.analyze(text),
+    }
+
+
+def time_cell(fn, items, min_seconds: float, repeat: int) -> float:
+    """
+    Best-of-`repeat` nanoseconds per character for fn over items, each run
+    looping enough times to last at least `min_seconds`.
+    """
+    chars = sum(len(text) for text, _ in items)
+    start = time.perf_counter_ns()
+    for text, hits in items:
+        fn(text, hits)
+    once = max(time.perf_counter_ns() - start, 1)
+    loops = max(1, int(min_seconds * 1e9 / once))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            for text, hits in items:
+                fn(text, hits)
+        elapsed = (time.perf_counter_ns() - start) / (loops * chars)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def allocation_cell(fn, items) -> dict:
+    # Peak traced memory of a single call above what was live before it
+    peaks = []
+    tracemalloc.start()
+    try:
+        for text, hits in items:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(text, hits)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    chars = sum(len(text) for text, _ in items)
+    return {
+        "peak_bytes_max": max(peaks),
+        "peak_bytes_per_char": round(sum(peaks) / chars, 2),
+    }
+
+
+def verdicts(service: ThreatIntelService, corpus) -> list:
+    return [service.analyze(text) for _, _, text in corpus]
+
+
+def check_verdicts(current: list, saved: dict, corpus) -> bool:
+    if saved["corpus"] != corpus_digest(corpus):
+        print(f"Corpus differs from the saved run ({saved['corpus']}); use the same --lengths and --seed")
+        return False
+    if saved["ruleset_version"] != RULESET_VERSION:
+        print(f"note: ruleset changed {saved['ruleset_version']} -> {RULESET_VERSION}")
+    mismatches = [i for i, (a, b) in enumerate(zip(saved["verdicts"], current)) if a != b]
+    for i in mismatches[:10]:
+        category, length, _ = corpus[i]
+        print(f"  #{i} {category}/{length}: {saved['verdicts'][i]} -> {current[i]}")
+    print(f"--- {len(mismatches)} OF {len(current)} VERDICTS CHANGED ---" if mismatches
+          else f"--- ALL {len(current)} VERDICTS IDENTICAL ---")
+    return not mismatches
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", default=",".join(str(n) for n in DEFAULT_LENGTHS))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="minimum duration of one timed run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save-verdicts", default=None)
+    parser.add_argument("--check-verdicts", default=None)
+    parser.add_argument("--out", default=None, help="write timings and allocations as JSON")
+    args = parser.parse_args(argv)
+    lengths = [int(n) for n in args.lengths.split(",")]
+
+    # Deterministic mode: the simulated model confidence comes from the text, not random()
+    service = ThreatIntelService(deterministic=True)
+    corpus = build_corpus(lengths, args.seed)
+    print(f"--- CORPUS {corpus_digest(corpus)}: {len(corpus)} texts, ruleset {RULESET_VERSION} ---")
+
+    current = verdicts(service, corpus)
+    ok = True
+    # The batch path must agree with per-text scans on the same corpus
+    if service.analyze_batch([text for _, _, text in corpus]) != current:
+        print("analyze_batch disagrees with analyze on this corpus")
+        ok = False
+    if args.check_verdicts:
+        with open(args.check_verdicts) as f:
+            ok = check_verdicts(current, json.load(f), corpus) and ok
+    if args.save_verdicts:
+        with open(args.save_verdicts, "w") as f:
+            json.dump({"corpus": corpus_digest(corpus), "ruleset_version": RULESET_VERSION, "verdicts": current}, f)
+        print(f"Verdicts saved to {args.save_verdicts}")
+
+    results = {}
+    fns = detectors(service)
+    print(f"{'ns/char':<14}" + "".join(f"{n:>10}" for n in lengths) + f"{'peak B/char':>14}")
+    for name, fn in fns.items():
+        row = {}
+        for length in lengths:
+            items = [(text, service.match_keywords(text)) for _, n, text in corpus if n == length]
+            row[length] = {"ns_per_char": round(time_cell(fn, items, args.min_seconds, args.repeat), 2),
+                           **allocation_cell(fn, items)}
+        results[name] = row
+        print(f"{name:<14}" + "".join(f"{row[n]['ns_per_char']:>10}" for n in lengths)
+              + f"{row[lengths[-1]]['peak_bytes_per_char']:>14}")
+
+    # Full scan per category at the largest length, where differences show most
+    by_category = {}
+    for category in CATEGORIES:
+        items = [(text, None) for c, n, text in corpus if c == category and n == lengths[-1]]
+        by_category[category] = round(time_cell(fns["scan_message"], items, args.min_seconds, args.repeat), 2)
+    print("scan_message ns/char at", lengths[-1], "chars:",
+          ", ".join(f"{c} {v}" for c, v in by_category.items()))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "corpus": corpus_digest(corpus),
+                "ruleset_version": RULESET_VERSION,
+                "python": platform.python_version(),
+                "detectors": results,
+                "scan_message_by_category": by_category,
+            }, f, indent=2)
+        print(f"Results written to {args.out}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.db.session import apply_sqlite_pragmas
+from app.models.user import User
+from app.models.message import Message # Import all models to ensure they are registered
+from app.models.dm_channel import DMChannel
+from app.models.rollup import MessageRollup
+from app.services.message_writer import MessageWriter
+
+# Concurrent /scan-style inserts against a scratch SQLite file:
+#   default  rollback journal, no pragmas, every request commits on its own connection
+#   profile  WAL + pragmas on connect, inserts serialized through MessageWriter
+#   group    profile + group commit (up to 64 rows or 5 ms per transaction)
+# A reader polls the newest page meanwhile, to show reads no longer queue behind writes.
+# Usage: python bench_sqlite_writes.py [--writers 32] [--messages 2000]
+
+async def run(mode: str, writers: int, messages: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    setup = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(setup)
+    with setup.begin() as conn:
+        conn.execute(User.__table__.insert().values(id=1, email="bench@sentinel.net", hashed_password="x"))
+    setup.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    if mode != "default":
+        event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
+    factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    if mode == "group":
+        writer = MessageWriter(factory, enabled=True, max_rows=64, max_delay_ms=5)
+    else:
+        writer = MessageWriter(factory, enabled=mode == "profile")
+
+    errors = 0
+    read_latencies = []
+    done = asyncio.Event()
+
+    async def insert(i: int):
+        nonlocal errors
+        message = Message(sender_id=1, content_encrypted=f"bench {i}", opsec_risk="SAFE",
+                          phishing_risk="LOW", channel_id="general")
+        async with factory() as db:
+            try:
+                await writer.insert([message], db)
+            except OperationalError:
+                # "database is locked" after busy_timeout; the request would have failed
+                errors += 1
+
+    async def worker(offset: int):
+        for i in range(offset, messages, writers):
+            await insert(i)
+
+    async def reader():
+        async with factory() as db:
+            while not done.is_set():
+                start = time.perf_counter()
+                await db.execute(select(Message.id).where(Message.channel_id == "general")
+                                 .order_by(Message.id.desc()).limit(50))
+                await db.rollback()
+                read_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+    reading = asyncio.create_task(reader())
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(w) for w in range(writers)])
+    elapsed = time.perf_counter() - start
+    done.set()
+    await reading
+    await writer.stop()
+
+    async with factory() as db:
+        stored = (await db.execute(select(func.count(Message.id)))).scalar_one()
+    await engine.dispose()
+
+    read_latencies.sort()
+    return {
+        "mode": mode,
+        "stored": stored,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "writes_per_s": round(stored / elapsed, 1),
+        "read_p50_ms": round(statistics.median(read_latencies) * 1000, 2) if read_latencies else None,
+        "read_p99_ms": round(read_latencies[int(len(read_latencies) * 0.99)] * 1000, 2) if read_latencies else None,
+    }
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    print(f"--- {args.messages} inserts from {args.writers} concurrent writers ---")
+    for mode in ("default", "profile", "group"):
+        result = asyncio.run(run(mode, args.writers, args.messages))
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,129 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.api.routers.chat import MESSAGE_PAGE
+from app.db import migrations
+from app.db.session import engine as configured_engine
+from app.models.user import User
+from app.models.message import Message # Import all models to ensure they are registered
+from app.models.dm_channel import DMChannel
+from app.models.rollup import MessageRollup
+
+# Run EXPLAIN on the hot query shapes of the API and fail if any of them
+# falls back to a full table scan. Never changes the schema it is pointed at:
+# the configured database must already be migrated to head, or --scratch checks
+# a fresh SQLite database built from the migrations in a temporary directory.
+# Usage: python check_query_plans.py [--scratch]   (exit code 1 on a full table scan)
+
+def hot_queries(db):
+    now = datetime.utcnow()
+    page = MESSAGE_PAGE.where(Message.channel_id == "general")
+    high_recent = db.query(Message).filter(Message.opsec_risk == "HIGH", Message.timestamp > now - timedelta(hours=1))
+    return {
+        # routers/chat.py get_messages
+        "messages: newest page": page.order_by(Message.id.desc()).limit(50),
+        "messages: before_id page": page.where(Message.id < 1000).order_by(Message.id.desc()).limit(50),
+        "messages: after_id probe": db.query(Message.id).filter(Message.channel_id == "general", Message.id > 1000).limit(1),
+        "messages: after_id page": page.where(Message.id > 1000).order_by(Message.id.asc()).limit(50),
+        "messages: after_id overlap": db.query(Message.id, Message.timestamp)
+            .filter(Message.channel_id == "general", Message.id <= 1000).order_by(Message.id.desc()).limit(20),
+        # routers/chat.py get_dms / services/dm_channels.py
+        "dms: membership list": db.query(DMChannel.channel_id, DMChannel.last_message_at, DMChannel.unread_count, User.full_name, User.email)
+            .join(User, User.id == DMChannel.peer_id).filter(DMChannel.user_id == 1)
+            .order_by(DMChannel.last_message_at.is_(None), DMChannel.last_message_at.desc()),
+        "dms: message counters": db.query(DMChannel.id).filter(DMChannel.channel_id == "dm_1_2"),
+        # routers/threat_intel.py recent_duplicates
+        "scan: duplicate lookup": db.query(Message).filter(
+            Message.sender_id == 1,
+            Message.integrity_hash.in_(["abc", "def"]),
+            Message.timestamp > now - timedelta(seconds=10)
+        ),
+        # routers/dashboard.py compute_dashboard_stats
+        "dashboard: active threats": select(func.count()).select_from(high_recent.subquery()),
+        "dashboard: recent messages": db.query(Message).filter(Message.timestamp > now - timedelta(hours=1)),
+        "dashboard: alerts": db.query(Message).filter(Message.opsec_risk == "HIGH").order_by(Message.timestamp.desc()).limit(5),
+        "dashboard: last 10": db.query(Message).order_by(Message.timestamp.desc()).limit(10),
+        # services/rollups.py threat_series
+        "rollups: window buckets": db.query(MessageRollup.bucket_epoch, func.sum(MessageRollup.count))
+            .filter(MessageRollup.bucket_epoch >= 0).group_by(MessageRollup.bucket_epoch),
+        "rollups: unrolled tail": db.query(func.count()).filter(Message.id > 1000, Message.timestamp >= now - timedelta(days=1)),
+        # services/ttl_reaper.py reap_chunk
+        "reaper: expired chunk": db.query(Message.id, Message.expiration).filter(Message.expiration <= now)
+            .order_by(Message.expiration).limit(500),
+        "reaper: detach replies": db.query(Message.id).filter(Message.reply_to_id.in_([1, 2, 3])),
+    }
+
+def explain(conn, statement):
+    # render_postcompile expands IN (...) lists into plain bound parameters
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positiontup is not None:
+        params = tuple(params[name] for name in compiled.positiontup)
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+        plan = [row[-1] for row in rows]
+        # "SCAN messages USING INDEX ..." is an ordered index walk (bounded by LIMIT); a bare SCAN reads every row
+        full_scans = [line for line in plan if line.split(" ")[:1] == ["SCAN"] and "USING" not in line]
+    else:
+        rows = conn.exec_driver_sql(f"EXPLAIN {compiled}", params).fetchall()
+        plan = [row[0] for row in rows]
+        full_scans = [line for line in plan if "Seq Scan" in line]
+    return plan, full_scans
+
+def check_query_plans(engine) -> bool:
+    print(f"--- QUERY PLAN CHECK ({engine.dialect.name}) ---")
+    version = migrations.current_version(engine)
+    if version < migrations.HEAD:
+        print(f"Schema version {version} is behind head {migrations.HEAD}: plans would not match production.")
+        print("Run `python migrate.py` first, or pass --scratch to check a fresh database.")
+        return False
+
+    # Only builds statements; nothing runs through the session
+    db = Session(bind=engine)
+    ok = True
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                # Small tables make a seq scan legitimately cheapest; ask whether an index path exists at all
+                conn.exec_driver_sql("SET enable_seqscan = off")
+            for name, query in hot_queries(db).items():
+                statement = getattr(query, "statement", query)
+                plan, full_scans = explain(conn, statement)
+                status = "FULL SCAN" if full_scans else "ok"
+                ok = ok and not full_scans
+                print(f"[{status}] {name}")
+                for line in plan:
+                    print(f"    {line}")
+    finally:
+        db.close()
+
+    print("--- ALL QUERIES INDEXED ---" if ok else "--- FULL TABLE SCANS FOUND ---")
+    return ok
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scratch", action="store_true",
+                        help="check a fresh SQLite database built from the migrations instead of the configured one")
+    args = parser.parse_args(argv)
+    if not args.scratch:
+        return 0 if check_query_plans(configured_engine) else 1
+
+    with tempfile.TemporaryDirectory(prefix="sentinelnet-plans-") as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'plans.db')}")
+        try:
+            migrations.upgrade(engine)
+            return 0 if check_query_plans(engine) else 1
+        finally:
+            engine.dispose()
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,39 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.session import engine
+from app.db import migrations
+
+# Usage:
+#   python migrate.py            apply pending migrations (run as a deploy/build step)
+#   python migrate.py status     show current and head versions
+#   python migrate.py <version>  upgrade only up to <version>
+
+def main(argv):
+    current = migrations.current_version(engine)
+    if argv and argv[0] == "status":
+        print(f"Schema version: {current} (head: {migrations.HEAD})")
+        for m in migrations.MIGRATIONS:
+            marker = "x" if m.version <= current else " "
+            print(f"  [{marker}] {m.version:03d} {m.description}")
+        return 0
+
+    target = int(argv[0]) if argv else migrations.HEAD
+    print(f"--- MIGRATING {current} -> {target} ---")
+    try:
+        applied = migrations.upgrade(engine, target)
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return 1
+    for m in applied:
+        print(f"Applied {m.version:03d} {m.description}")
+    if not applied:
+        print("Already up to date.")
+    print("--- MIGRATION COMPLETE ---")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,8 +6,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.db.base import Base
 from app.db.session import engine, SessionLocal
+from app.db import migrations
 from app.models.user import User
 from app.models.message import Message # Import all models to ensure they are registered
+from app.models.dm_channel import DMChannel
+from app.models.rollup import MessageRollup, RollupState
 from app.core import security
 
 def reset_database():
@@ -17,41 +20,24 @@ def reset_database():
     print("Dropping all tables...")
     try:
         Base.metadata.drop_all(bind=engine)
+        if engine.dialect.name == "sqlite":
+            # Full-text index lives outside the models (migration 006)
+            with engine.begin() as conn:
+                conn.exec_driver_sql("DROP TABLE IF EXISTS messages_fts")
         print("Tables dropped.")
     except Exception as e:
         print(f"Error dropping tables: {e}")
         return
 
-    # 2. Create all tables
-    print("Creating all tables...")
+    # 2. Recreate schema (tables, indexes, default admin) through the migration runner
+    print("Applying migrations...")
     try:
-        Base.metadata.create_all(bind=engine)
-        print("Tables created.")
+        migrations.schema_version.drop(bind=engine, checkfirst=True)
+        for m in migrations.upgrade(engine):
+            print(f"Applied {m.version:03d} {m.description}")
     except Exception as e:
-        print(f"Error creating tables: {e}")
+        print(f"Error applying migrations: {e}")
         return
-
-    # 3. Create Default Admin User
-    print("Creating default admin user...")
-    db = SessionLocal()
-    try:
-        if not db.query(User).filter(User.email == "admin@sentinel.net").first():
-            user = User(
-                email="admin@sentinel.net",
-                hashed_password=security.get_password_hash("admin"),
-                full_name="Commander Shepard",
-                role="admin",
-                is_active=True
-            )
-            db.add(user)
-            db.commit()
-            print("Default user 'admin@sentinel.net' created.")
-        else:
-            print("Default user already exists.")
-    except Exception as e:
-        print(f"Error creating default user: {e}")
-    finally:
-        db.close()
         
     print("--- DATABASE RESET COMPLETE ---")
 
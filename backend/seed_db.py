@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Ensure backend directory is in path so we can import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+
+from app.db.session import engine
+from app.models.user import User
+from app.models.message import Message # Import all models to ensure they are registered
+from app.services.seeding import seed_database
+
+# Fill the configured database with synthetic users, group and DM channels and
+# messages (replies, TTLs, attachments, realistic risk mix) for testing indexes,
+# pagination and the dashboard at production scale. Adds to existing data.
+# Message indexes are dropped during the load and rebuilt at the end unless --keep-indexes.
+# Seeded users log in as user<id>@seed.sentinel.net / sentinel.
+# Usage: python seed_db.py [--users 1000] [--messages 1000000] [--days 90] [--group-channels 8]
+#                          [--dm-per-user 4] [--batch 20000] [--seed 1] [--keep-indexes]
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--group-channels", type=int, default=8)
+    parser.add_argument("--dm-per-user", type=int, default=4, help="average DM peers per user")
+    parser.add_argument("--batch", type=int, default=20000, help="rows per insert / COPY and transaction")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-indexes", action="store_true", help="maintain indexes row by row during the load")
+    args = parser.parse_args(argv)
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+
+    print(f"--- SEEDING {engine.dialect.name}: {args.users} users, {args.messages} messages over {args.days:g} days ---")
+    try:
+        summary = seed_database(
+            engine, users=args.users, messages=args.messages, days=args.days,
+            group_channels=args.group_channels, dm_per_user=args.dm_per_user,
+            batch_size=args.batch, seed=args.seed, defer_indexes=not args.keep_indexes,
+        )
+    except Exception as e:
+        print(f"Seeding failed: {e}")
+        return 1
+
+    rate = summary["messages"] / summary["seconds"] if summary["seconds"] else 0
+    print(f"--- SEEDED {summary['messages']} MESSAGES IN {summary['seconds']}s ({rate:.0f} rows/s) ---")
+    print(f"Log in as {summary['emails'][0]} / sentinel")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -27,6 +27,27 @@ interface DashboardStats {
     geo_risks: { lat: number; lng: number; risk: string }[];
 }
 
+// Stream "update" event: replaced fields, and list fields spliced around their unchanged run
+interface ListSplice {
+    head: any[];
+    start: number;
+    end: number;
+    tail: any[];
+}
+
+interface StatsUpdate {
+    set: Partial<DashboardStats>;
+    splice: Record<string, ListSplice>;
+}
+
+function applyUpdate(prev: DashboardStats, update: StatsUpdate): DashboardStats {
+    const next: any = { ...prev, ...update.set };
+    for (const [key, patch] of Object.entries(update.splice)) {
+        next[key] = [...patch.head, ...(prev as any)[key].slice(patch.start, patch.end), ...patch.tail];
+    }
+    return next;
+}
+
 export default function Dashboard() {
     const [stats, setStats] = useState<DashboardStats | null>(null);
 
@@ -48,9 +69,34 @@ export default function Dashboard() {
     };
 
     useEffect(() => {
-        fetchStats();
-        const interval = setInterval(fetchStats, 3000); // Poll every 3s
-        return () => clearInterval(interval);
+        // Prefer the shared SSE stream; fall back to polling every 3s if it is unavailable
+        let interval: ReturnType<typeof setInterval> | null = null;
+        const startPolling = () => {
+            if (interval) return;
+            fetchStats();
+            interval = setInterval(fetchStats, 3000);
+        };
+
+        if (typeof EventSource === "undefined") {
+            startPolling();
+            return () => { if (interval) clearInterval(interval); };
+        }
+
+        const source = new EventSource("/api/v1/dashboard/stream");
+        source.addEventListener("snapshot", (e) => setStats(JSON.parse((e as MessageEvent).data)));
+        source.addEventListener("update", (e) => {
+            const changed: StatsUpdate = JSON.parse((e as MessageEvent).data);
+            setStats(prev => prev ? applyUpdate(prev, changed) : prev);
+        });
+        source.onerror = () => {
+            source.close();
+            startPolling();
+        };
+
+        return () => {
+            source.close();
+            if (interval) clearInterval(interval);
+        };
     }, []);
 
     if (!stats) return (
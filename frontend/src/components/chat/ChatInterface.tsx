@@ -49,6 +49,55 @@ const mockMessages: Message[] = [
     }
 ];
 
+// Backend message (GET /chat/messages row or WebSocket push) -> client Message
+function toMessage(backendMsg: any): Message {
+    return {
+        id: backendMsg.id.toString(),
+        text: backendMsg.content_encrypted || backendMsg.text, // Handle potential field name diffs
+        sender: (backendMsg.sender === 'me' ? 'me' : 'them'),
+        timestamp: new Date(backendMsg.timestamp.endsWith("Z") ? backendMsg.timestamp : backendMsg.timestamp + "Z"),
+        status: backendMsg.risk?.opsec_risk === 'HIGH' ? 'blocked' : 'sent',
+        risk: backendMsg.risk,
+        file: backendMsg.file_url ? {
+            url: backendMsg.file_url,
+            type: backendMsg.file_type,
+            size: backendMsg.file_size,
+            name: backendMsg.file_type || "Encrypted File"
+        } : undefined,
+        integrityHash: backendMsg.integrity_hash,
+        is_deleted: backendMsg.is_deleted,
+        replyTo: backendMsg.reply_to ? {
+            id: backendMsg.reply_to.id,
+            text: backendMsg.reply_to.text,
+            sender: backendMsg.reply_to.sender
+        } : undefined
+    };
+}
+
+// True when a pending local message (temporary id) has arrived from the backend
+function isConfirmedBy(localMsg: Message, backendMessages: Message[]): boolean {
+    // Check exact hash match
+    if (localMsg.integrityHash && backendMessages.some(bm => bm.integrityHash === localMsg.integrityHash)) {
+        console.log("Removing pending msg (hash match):", localMsg.id);
+        return true;
+    }
+
+    // Check text match (fallback for legacy or missing hash)
+    // Only match if within reasonable time window (e.g. 10 seconds)
+    const matchingBackend = backendMessages.find(bm =>
+        bm.text === localMsg.text &&
+        bm.sender === 'me' &&
+        Math.abs(bm.timestamp.getTime() - localMsg.timestamp.getTime()) < 10000
+    );
+
+    if (matchingBackend) {
+        console.log("Removing pending msg (text match):", localMsg.id);
+        return true;
+    }
+
+    return false;
+}
+
 export function ChatInterface() {
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState("");
@@ -68,9 +117,13 @@ export function ChatInterface() {
     const fileInputRef = useRef<HTMLInputElement>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const selectedChannelRef = useRef(selectedChannel);
+    // Highest message id loaded for the selected channel: polls only ask for newer ones
+    const lastIdRef = useRef<number | null>(null);
+    const pollCountRef = useRef(0);
 
     useEffect(() => {
         selectedChannelRef.current = selectedChannel;
+        lastIdRef.current = null;
     }, [selectedChannel]);
 
     const handleLogout = async () => {
@@ -124,9 +177,13 @@ export function ChatInterface() {
         if (!token) return;
         
         const fetchChannel = selectedChannel; // Capture current channel for this request
+        // Incremental after the first page; every 30th poll (~10s) reloads the page to
+        // pick up deletions and other edits to messages already shown
+        const afterId = pollCountRef.current++ % 30 === 0 ? null : lastIdRef.current;
+        const query = afterId === null ? "" : `&after_id=${afterId}`;
 
         try {
-            const res = await fetch(`/api/v1/chat/messages?channel_id=${fetchChannel}`, {
+            const res = await fetch(`/api/v1/chat/messages?channel_id=${fetchChannel}${query}`, {
                 headers: {
                     'Authorization': `Bearer ${token}`
                 }
@@ -143,6 +200,24 @@ export function ChatInterface() {
                 
                 // CRITICAL FIX: Ensure this data is still meant for the currently active channel
                 if (selectedChannelRef.current !== fetchChannel) return;
+
+                if (data.length > 0) {
+                    const maxId = Math.max(...data.map((m: any) => m.id));
+                    lastIdRef.current = Math.max(lastIdRef.current ?? 0, maxId);
+                }
+
+                if (afterId !== null) {
+                    // Append only ids we do not have yet: the server may repeat recent messages
+                    if (data.length === 0) return;
+                    setMessages(prev => {
+                        const known = new Set(prev.map(m => m.id));
+                        const fresh: Message[] = data.map(toMessage).filter((m: Message) => !known.has(m.id));
+                        if (fresh.length === 0) return prev;
+                        const kept = prev.filter(m => !(m.id.length > 10 && m.sender === 'me' && isConfirmedBy(m, fresh)));
+                        return [...kept, ...fresh].sort((a, b) => a.timestamp.getTime() - b.timestamp.getTime());
+                    });
+                    return;
+                }
                 
                 // Merge logic could be simpler: just replace for now or append new ones
                 // To avoid jitter, we can just setMessages if the length is different or last message ID different
@@ -163,55 +238,14 @@ export function ChatInterface() {
 
                 setMessages(prev => {
                     // 1. Convert Backend Data to Message Objects
-                    const backendMessages: Message[] = data.map((backendMsg: any) => ({
-                        id: backendMsg.id.toString(),
-                        text: backendMsg.content_encrypted || backendMsg.text, // Handle potential field name diffs
-                        sender: (backendMsg.sender === 'me' ? 'me' : 'them'),
-                        timestamp: new Date(backendMsg.timestamp.endsWith("Z") ? backendMsg.timestamp : backendMsg.timestamp + "Z"),
-                        status: backendMsg.risk?.opsec_risk === 'HIGH' ? 'blocked' : 'sent',
-                        risk: backendMsg.risk,
-                        file: backendMsg.file_url ? {
-                            url: backendMsg.file_url,
-                            type: backendMsg.file_type,
-                            size: backendMsg.file_size,
-                            name: backendMsg.file_type || "Encrypted File"
-                        } : undefined,
-                        integrityHash: backendMsg.integrity_hash,
-                        is_deleted: backendMsg.is_deleted,
-                        replyTo: backendMsg.reply_to ? {
-                            id: backendMsg.reply_to.id,
-                            text: backendMsg.reply_to.text,
-                            sender: backendMsg.reply_to.sender
-                        } : undefined
-                    }));
+                    const backendMessages: Message[] = data.map(toMessage);
 
                     // 2. Identify Pending Local Messages (Scanning/Unconfirmed)
                     // These are messages with temporary IDs (long timestamps) created locally
                     const pendingLocalMessages = prev.filter(m => m.id.length > 10 && m.sender === 'me');
 
                     // 3. Filter Pending Messages: Remove if they are now in Backend
-                    const uniquePending = pendingLocalMessages.filter(localMsg => {
-                        // Check exact hash match
-                        if (localMsg.integrityHash && backendMessages.some(bm => bm.integrityHash === localMsg.integrityHash)) {
-                            console.log("Removing pending msg (hash match):", localMsg.id);
-                            return false;
-                        }
-
-                        // Check text match (fallback for legacy or missing hash)
-                        // Only match if within reasonable time window (e.g. 10 seconds)
-                        const matchingBackend = backendMessages.find(bm =>
-                            bm.text === localMsg.text &&
-                            bm.sender === 'me' &&
-                            Math.abs(bm.timestamp.getTime() - localMsg.timestamp.getTime()) < 10000
-                        );
-
-                        if (matchingBackend) {
-                            console.log("Removing pending msg (text match):", localMsg.id);
-                            return false;
-                        }
-
-                        return true;
-                    });
+                    const uniquePending = pendingLocalMessages.filter(localMsg => !isConfirmedBy(localMsg, backendMessages));
 
                     // 4. Merge: Backend Truth + Remaining Pending + Offline Messages
                     const offlineListRaw = JSON.parse(localStorage.getItem("offlineMessages") || "[]");
@@ -272,12 +306,37 @@ export function ChatInterface() {
 
         initChat();
 
-        // Poll more frequently for faster updates
+        // Live push channel: the backend announces new messages, polling is only the fallback
+        const wsToken = localStorage.getItem("token");
+        let socket: WebSocket | null = null;
+        if (wsToken) {
+            const wsHost = process.env.NEXT_PUBLIC_WS_HOST || window.location.host;
+            const wsProto = window.location.protocol === "https:" ? "wss" : "ws";
+            socket = new WebSocket(`${wsProto}://${wsHost}/api/v1/chat/ws?token=${wsToken}&channel_id=${selectedChannel}`);
+            socket.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (data.type === "message" && data.channel_id === selectedChannelRef.current) {
+                    // The push carries the rendered message: append it instead of refetching the page
+                    const pushed = toMessage(data);
+                    setMessages(prev => {
+                        if (prev.some(m => m.id === pushed.id)) return prev;
+                        const kept = prev.filter(m => !(m.id.length > 10 && m.sender === 'me' && isConfirmedBy(m, [pushed])));
+                        return [...kept, pushed].sort((a, b) => a.timestamp.getTime() - b.timestamp.getTime());
+                    });
+                }
+            };
+        }
+
+        // Poll more frequently for faster updates (skipped while the socket is live)
         const interval = setInterval(() => {
+            if (socket?.readyState === WebSocket.OPEN) return;
             fetchMessages();
         }, 300);
 
-        return () => clearInterval(interval);
+        return () => {
+            clearInterval(interval);
+            socket?.close();
+        };
     }, [selectedChannel]);
 
     const sendingRef = useRef(false);